@@ -10,15 +10,16 @@ import subprocess
 import sys
 from pygame import mixer
 
+from ffmpeg_toolchain import audio_codec_args, ffmpeg_available, ffmpeg_path, video_codec_args
+
 # Set theme
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
 # Check FFmpeg
 def check_ffmpeg():
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    # Probed once per FFmpeg build, then read from the on-disk cache
+    if not ffmpeg_available():
         messagebox.showerror("Error", "FFmpeg is not installed. Please install FFmpeg and add it to PATH.")
         sys.exit(1)
 
@@ -112,7 +113,10 @@ class ConverterApp:
 
         if output_file:
             try:
-                command = ["ffmpeg", "-i", self.selected_file, output_file]
+                command = [
+                    ffmpeg_path(), "-i", self.selected_file,
+                    *video_codec_args(target_format), *audio_codec_args(target_format), output_file
+                ]
                 subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
                 messagebox.showinfo("Success", "File converted successfully!")
             except Exception as e:
@@ -9,15 +9,17 @@ import subprocess
 import sys
 import shutil
 
+# ffmpeg_toolchain lives in the repository root; run this from the root with the root on PYTHONPATH:
+#     PYTHONPATH=. python "New folder/converter.py"
+from ffmpeg_toolchain import ffmpeg_available, ffmpeg_path, video_codec_args
+
 # Set appearance mode and color theme
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
 def check_ffmpeg():
-    """Check if FFmpeg is installed."""
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    """Check if FFmpeg is installed (probed once per FFmpeg build, then read from cache)."""
+    if not ffmpeg_available():
         messagebox.showerror("Error", "FFmpeg is not installed. Please install FFmpeg manually and add it to PATH.")
         sys.exit(1)
 
@@ -81,14 +83,14 @@ class ConverterApp:
 
     def convert_video(self, output_file, target_format):
         try:
-            command = ["ffmpeg", "-i", self.selected_file, "-c:v", "libx264", "-preset", "fast", "-crf", "23", output_file]
+            command = [ffmpeg_path(), "-i", self.selected_file, *video_codec_args(target_format, crf=23, preset="fast"), output_file]
             subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
         except Exception as e:
             raise Exception(f"Video conversion failed: {e}")
 
     def convert_audio(self, output_file, target_format):
         try:
-            command = ["ffmpeg", "-i", self.selected_file, "-q:a", "0", "-map", "a", output_file]
+            command = [ffmpeg_path(), "-i", self.selected_file, "-q:a", "0", "-map", "a", output_file]
             subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
         except Exception as e:
             raise Exception(f"Audio conversion failed: {e}")
@@ -0,0 +1,38 @@
+import hashlib
+import json
+import os
+
+# Everything the apps cache between launches lives under one directory
+CACHE_ROOT = os.environ.get("PLAYER_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "player")
+
+
+def cache_dir(name):
+    """Return (and create) a named sub-directory of the cache root."""
+    path = os.path.join(CACHE_ROOT, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_key(path):
+    """Cache key for a file that changes whenever the file is replaced or modified."""
+    st = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def load_json(name, key):
+    """Load a cached JSON record, or None if it is missing or unreadable."""
+    try:
+        with open(os.path.join(cache_dir(name), f"{key}.json"), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_json(name, key, data):
+    """Write a JSON record atomically so a crash never leaves half a file behind."""
+    path = os.path.join(cache_dir(name), f"{key}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
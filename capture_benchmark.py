@@ -0,0 +1,106 @@
+"""Benchmark the screen capture backends and the recorder, headless if need be.
+
+    python capture_benchmark.py --xvfb --size 1920x1080 --seconds 5
+    python capture_benchmark.py --backend xshm --record /tmp/bench.mp4 --fps 60
+
+--xvfb starts a private Xvfb server for the run, so this works over SSH and in
+CI. Each backend grabs as fast as it can and reports frames per second and
+per-grab latency; --record then runs the real recorder at --fps and reports
+the frame rate it sustained.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+from screen_capture import BACKENDS, CaptureError, open_capture
+from recording_sink import DEFAULT_CODEC, DEFAULT_CRF, DEFAULT_PRESET, RecordingError
+from screen_recorder import DEFAULT_FPS, ScreenRecorder
+
+
+def start_xvfb(size, display_number=99):
+    """Start Xvfb on a free display number; returns the process with DISPLAY set for this process."""
+    if shutil.which("Xvfb") is None:
+        raise SystemExit("Xvfb is not installed (apt install xvfb)")
+    while os.path.exists(f"/tmp/.X11-unix/X{display_number}"):
+        display_number += 1
+    process = subprocess.Popen(
+        ["Xvfb", f":{display_number}", "-screen", "0", f"{size[0]}x{size[1]}x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while not os.path.exists(f"/tmp/.X11-unix/X{display_number}"):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise SystemExit("Xvfb did not start")
+        time.sleep(0.05)
+    os.environ["DISPLAY"] = f":{display_number}"
+    return process
+
+
+def bench_backend(name, seconds):
+    """Grab back to back for `seconds`; returns a result line."""
+    try:
+        capture = open_capture(name)
+    except CaptureError as e:
+        return f"{name:<5} unavailable: {e}"
+    times = []
+    try:
+        capture.grab()  # Warm-up: first grab pays for lazy setup
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            before = time.perf_counter()
+            capture.grab()
+            times.append(time.perf_counter() - before)
+    except CaptureError as e:
+        return f"{name:<5} failed: {e}"
+    finally:
+        capture.close()
+    if not times:
+        # Nothing was timed, e.g. with --seconds 0
+        return f"{name:<5} failed: no grab finished within {seconds:g}s"
+    times.sort()
+    p95 = times[int(len(times) * 0.95)] * 1000
+    return (f"{name:<5} {capture.size[0]}x{capture.size[1]}  {len(times) / seconds:7.1f} fps  "
+            f"mean {statistics.mean(times) * 1000:6.2f} ms  p95 {p95:6.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark screen capture and recording.")
+    parser.add_argument("--backend", action="append", choices=list(BACKENDS), help="backend to test (default: all)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--xvfb", action="store_true", help="run against a private Xvfb server")
+    parser.add_argument("--size", default="1920x1080", help="Xvfb screen size")
+    parser.add_argument("--record", metavar="FILE", help="also record to FILE with the recorder")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="target frame rate for --record")
+    parser.add_argument("--codec", default=DEFAULT_CODEC, choices=["h264", "hevc"])
+    parser.add_argument("--crf", type=int, default=DEFAULT_CRF)
+    parser.add_argument("--preset", default=DEFAULT_PRESET)
+    args = parser.parse_args(argv)
+
+    xvfb = start_xvfb(tuple(int(v) for v in args.size.lower().split("x"))) if args.xvfb else None
+    try:
+        for name in args.backend or BACKENDS:
+            print(bench_backend(name, args.seconds), flush=True)
+        if args.record:
+            backend = args.backend[0] if args.backend else None
+            recorder = ScreenRecorder(args.record, args.fps, backend, codec=args.codec, crf=args.crf, preset=args.preset)
+            try:
+                recorder.start()
+            except (CaptureError, RecordingError) as e:
+                print(f"record: {e}")
+                return 1
+            time.sleep(args.seconds)
+            stats = recorder.stop()
+            print(f"record (target {args.fps} fps): {stats.report()}")
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,19 +2,29 @@ import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk, ImageGrab
-import cv2
 import customtkinter as ctk
 import threading
-import time
 import subprocess
 import sys
 import shutil
+import tempfile
 import requests
 import zipfile
 from pygame import mixer
-import re
 import pyautogui
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from ffmpeg_jobs import DONE, FAILED, FFmpegJob, FFmpegJobQueue
+from ffmpeg_toolchain import ffmpeg_available, ffmpeg_path
+from job_panel import REFRESH_INTERVAL_MS, JobPanel
+from media_probe import probe_media
+from output_cache import OutputCache
+from recording_sink import DEFAULT_CRF, DEFAULT_REPLAY_SECONDS, REPLAY_FILETYPES, RecordingError, remux
+from screen_capture import CaptureError
+from screen_recorder import QUALITY_CRF, ScreenRecorder
+from stream_plan import plan_streams
+from thumbnails import ScrubPreview, ThumbnailStrip
+from video_engine import DisplaySink, VideoEngine
 
 # Set theme
 ctk.set_appearance_mode("System")
@@ -24,56 +34,53 @@ ctk.set_default_color_theme("blue")
 mixer.init()
 
 def install_ffmpeg():
-    """Install FFmpeg automatically if it's not already installed."""
-    try:
-        # Check if FFmpeg is installed
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    """Install FFmpeg automatically if it's not already installed. Returns True once FFmpeg is usable."""
+    if ffmpeg_available():
         print("FFmpeg is already installed.")
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("FFmpeg not found. Installing FFmpeg...")
-        try:
-            if sys.platform == "win32":
-                # Download FFmpeg for Windows
-                ffmpeg_url = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
-                ffmpeg_zip = "ffmpeg.zip"
-                ffmpeg_dir = "ffmpeg"
-
-                # Download FFmpeg
-                print("Downloading FFmpeg...")
-                response = requests.get(ffmpeg_url, stream=True)
-                with open(ffmpeg_zip, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-
-                # Extract FFmpeg
-                print("Extracting FFmpeg...")
-                with zipfile.ZipFile(ffmpeg_zip, "r") as zip_ref:
-                    zip_ref.extractall(ffmpeg_dir)
-
-                # Move FFmpeg executable to the current directory
-                for root, dirs, files in os.walk(ffmpeg_dir):
-                    if "ffmpeg.exe" in files:
-                        ffmpeg_path = os.path.join(root, "ffmpeg.exe")
-                        shutil.move(ffmpeg_path, ".")
-                        break
-
-                # Clean up
-                os.remove(ffmpeg_zip)
-                shutil.rmtree(ffmpeg_dir)
-
-                print("FFmpeg installed successfully.")
-            elif sys.platform == "darwin":  # macOS
-                subprocess.run(["brew", "install", "ffmpeg"], check=True)
-            elif sys.platform == "linux":  # Linux
-                subprocess.run(["sudo", "apt-get", "install", "ffmpeg", "-y"], check=True)
-            else:
-                raise Exception("Unsupported operating system.")
-        except Exception as e:
-            print(f"Failed to install FFmpeg: {e}")
-            messagebox.showerror("Error", "Failed to install FFmpeg. Please install it manually.")
+        return True
 
-# Install FFmpeg if not already installed
-install_ffmpeg()
+    print("FFmpeg not found. Installing FFmpeg...")
+    try:
+        if sys.platform == "win32":
+            # Download FFmpeg for Windows
+            ffmpeg_url = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
+            ffmpeg_zip = "ffmpeg.zip"
+            ffmpeg_dir = "ffmpeg"
+
+            # Download FFmpeg
+            print("Downloading FFmpeg...")
+            response = requests.get(ffmpeg_url, stream=True)
+            with open(ffmpeg_zip, "wb") as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+
+            # Extract FFmpeg
+            print("Extracting FFmpeg...")
+            with zipfile.ZipFile(ffmpeg_zip, "r") as zip_ref:
+                zip_ref.extractall(ffmpeg_dir)
+
+            # Move FFmpeg executable to the current directory
+            for root, dirs, files in os.walk(ffmpeg_dir):
+                if "ffmpeg.exe" in files:
+                    ffmpeg_path = os.path.join(root, "ffmpeg.exe")
+                    shutil.move(ffmpeg_path, ".")
+                    break
+
+            # Clean up
+            os.remove(ffmpeg_zip)
+            shutil.rmtree(ffmpeg_dir)
+
+            print("FFmpeg installed successfully.")
+        elif sys.platform == "darwin":  # macOS
+            subprocess.run(["brew", "install", "ffmpeg"], check=True)
+        elif sys.platform == "linux":  # Linux
+            subprocess.run(["sudo", "apt-get", "install", "ffmpeg", "-y"], check=True)
+        else:
+            raise Exception("Unsupported operating system.")
+    except Exception as e:
+        print(f"Failed to install FFmpeg: {e}")
+        return False
+    return ffmpeg_available()
 
 class ConverterApp:
     def __init__(self, root):
@@ -143,16 +150,31 @@ class ConverterApp:
         )
         self.recording_quality_menu.pack(fill="x", padx=5, pady=5)
 
+        # Replay buffer: keeps the last seconds of screen in memory; F9 saves them
+        self.replay_button = ctk.CTkButton(self.recorder_frame, text="⏪ Replay Buffer", command=self.toggle_replay_buffer)
+        self.replay_button.pack(fill="x", padx=5, pady=5)
+
+        self.save_replay_button = ctk.CTkButton(self.recorder_frame, text="💾 Save Replay (F9)", command=self.save_replay, state=tk.DISABLED)
+        self.save_replay_button.pack(fill="x", padx=5, pady=5)
+        self.root.bind("<F9>", self.save_replay)
+
         # Snip Tool Button
         self.snip_button = ctk.CTkButton(self.sidebar, text="✂️ Snip Tool", command=self.start_snipping)
         self.snip_button.grid(row=7, column=0, padx=10, pady=10, sticky="ew")
 
+        # Conversion job queue with per-job progress
+        self.job_queue = FFmpegJobQueue()
+        self.output_cache = OutputCache()
+        self.job_panel = JobPanel(self.sidebar, self.job_queue)
+        self.job_panel.frame.grid(row=8, column=0, padx=10, pady=10, sticky="ew")
+
         # Main Player Frame (Auto-Resize)
         self.main_frame = ctk.CTkFrame(root, fg_color="black")
         self.main_frame.grid(row=0, column=1, padx=5, pady=5, sticky="nsew")
 
         self.video_label = tk.Label(self.main_frame, text="Video Player", bg="black", fg="white")
         self.video_label.pack(fill="both", expand=True, padx=10, pady=10)
+        self.display_sink = DisplaySink(self.video_label)
 
         # Footer (Fixed at the bottom)
         self.footer = ctk.CTkFrame(root, fg_color="#333")
@@ -165,6 +187,10 @@ class ConverterApp:
 
         # Bind click event to progress bar for seeking
         self.video_progress_bar.bind("<Button-1>", self.seek_video)
+        self.video_progress_bar.bind("<B1-Motion>", self.seek_video)
+
+        # Thumbnail tooltip while hovering the progress bar
+        self.scrub_preview = ScrubPreview(self.video_progress_bar)
 
         # Control Buttons (Centered)
         self.button_frame = ctk.CTkFrame(self.footer, fg_color="#333")
@@ -185,9 +211,19 @@ class ConverterApp:
         self.forward_button = ctk.CTkButton(self.button_frame, text="⏩ +10s", command=self.forward_video, state=tk.DISABLED)
         self.forward_button.pack(side="left", padx=5)
 
+        self.step_back_button = ctk.CTkButton(self.button_frame, text="⏮ Frame", command=self.step_back, state=tk.DISABLED)
+        self.step_back_button.pack(side="left", padx=5)
+
+        self.step_forward_button = ctk.CTkButton(self.button_frame, text="⏭ Frame", command=self.step_forward, state=tk.DISABLED)
+        self.step_forward_button.pack(side="left", padx=5)
+
         self.fullscreen_button = ctk.CTkButton(self.button_frame, text="🔳 Full Screen", command=self.full_screen, state=tk.DISABLED)
         self.fullscreen_button.pack(side="left", padx=5)
 
+        # Measured vs target playback frame rate
+        self.fps_label = ctk.CTkLabel(self.button_frame, text="", fg_color="transparent")
+        self.fps_label.pack(side="left", padx=5)
+
         # Auto-Repeat Playback Checkbox in Footer
         self.auto_repeat_var = tk.BooleanVar(value=False)
         self.auto_repeat_checkbox = ctk.CTkCheckBox(self.footer, text="Auto-Repeat Playback", variable=self.auto_repeat_var)
@@ -196,15 +232,18 @@ class ConverterApp:
         # Variables
         self.selected_file = None
         self.cap = None
+        self.video_engine = None
+        self.frame_buffer_depth = 8  # Decoded frames kept ready ahead of the display
+        self.frame_cache_mb = 256  # Memory ceiling for recently decoded frames (stepping/back-seek)
+        self.thumbnail_strip = None
         self.media_playing = False
         self.media_paused = False
         self.total_frames = 0
         self.current_frame = 0
 
         # Screen Recorder Variables
-        self.recording = False
-        self.paused = False
-        self.recording_thread = None
+        self.recorder = None
+        self.replay_saver = ThreadPoolExecutor(max_workers=1)
         self.output_file = None
 
         # Snip Tool Variables
@@ -215,6 +254,16 @@ class ConverterApp:
         self.end_y = None
         self.snip_canvas = None
 
+        self.reported_jobs = set()
+        self.refresh_jobs()
+
+        # Check for FFmpeg in the background so the window shows up straight away
+        threading.Thread(target=self.check_ffmpeg, daemon=True).start()
+
+    def check_ffmpeg(self):
+        if not install_ffmpeg():
+            self.root.after(0, lambda: messagebox.showerror("Error", "Failed to install FFmpeg. Please install it manually."))
+
     def select_file(self):
         self.selected_file = filedialog.askopenfilename()
         if self.selected_file:
@@ -233,50 +282,62 @@ class ConverterApp:
         if output_file:
             try:
                 quality = self.quality_var.get()
-                command = ["ffmpeg", "-i", self.selected_file]
 
-                # Add quality settings based on selection
+                # Bitrate caps for the selected quality; streams already under them are copied
+                video_bitrate, audio_bitrate = None, None
                 if quality == "Low":
-                    command.extend(["-b:v", "500k", "-b:a", "128k"])
+                    video_bitrate, audio_bitrate = "500k", "128k"
                 elif quality == "Medium":
-                    command.extend(["-b:v", "1000k", "-b:a", "192k"])
+                    video_bitrate, audio_bitrate = "1000k", "192k"
                 elif quality == "High":
-                    command.extend(["-b:v", "2000k", "-b:a", "256k"])
+                    video_bitrate, audio_bitrate = "2000k", "256k"
                 elif quality == "4K":
-                    command.extend(["-b:v", "8000k", "-b:a", "320k"])
+                    video_bitrate, audio_bitrate = "8000k", "320k"
                 elif quality == "8K":
-                    command.extend(["-b:v", "16000k", "-b:a", "320k"])
+                    video_bitrate, audio_bitrate = "16000k", "320k"
 
-                command.append(output_file)
-                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-
-                # Thread to monitor conversion progress
-                threading.Thread(target=self.monitor_conversion, args=(process,), daemon=True).start()
+                plan = self.plan_conversion(target_format, video_bitrate=video_bitrate, audio_bitrate=audio_bitrate)
+                command = [ffmpeg_path(), "-i", self.selected_file, *plan.args, output_file]
+                self.queue_conversion(command, output_file, target_format, plan.notes)
             except Exception as e:
                 messagebox.showerror("Error", f"Conversion failed: {e}")
 
-    def monitor_conversion(self, process):
-        """Monitor FFmpeg conversion progress and update the progress bar."""
-        duration = 0
-        for line in process.stderr:
-            if "Duration" in line:
-                match = re.search(r"Duration: (\d+):(\d+):(\d+).\d+", line)
-                if match:
-                    duration = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + int(match.group(3))
-            if "time=" in line:
-                match = re.search(r"time=(\d+):(\d+):(\d+).\d+", line)
-                if match and duration > 0:
-                    current_time = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + int(match.group(3))
-                    progress = current_time / duration
-                    self.conversion_progress_var.set(progress)
-                    self.conversion_percentage_label.configure(text=f"{int(progress * 100)}%")
-                    self.root.update_idletasks()
-
-        process.wait()
-        if process.returncode == 0:
-            messagebox.showinfo("Success", "File converted successfully!")
-        else:
-            messagebox.showerror("Error", "Conversion failed.")
+    def queue_conversion(self, command, output_file, target_format, notes=()):
+        """Hand an FFmpeg command to the job queue; its progress shows up in the jobs panel."""
+        job = FFmpegJob(command, output_file)
+        job.notes.extend(notes)
+        for note in notes:
+            print(f"{job.label}: {note}")
+        # Everything between the input and the output file describes the settings
+        job.use_cache(self.output_cache, self.selected_file, target_format, command[3:-1])
+        return self.job_queue.submit_job(job)
+
+    def plan_conversion(self, target_format, **limits):
+        """Probe the selected file and decide per stream whether to copy or re-encode it."""
+        try:
+            media = probe_media(self.selected_file)
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            media = None
+        return plan_streams(media, target_format, **limits)
+
+    def refresh_jobs(self):
+        """Poll the job queue from the Tk main loop and report finished jobs."""
+        self.job_panel.refresh()
+        active = self.job_queue.active_jobs()
+        if active:
+            progress = sum(job.progress for job in active) / len(active)
+            self.conversion_progress_var.set(progress)
+            self.conversion_percentage_label.configure(text=f"{int(progress * 100)}%")
+
+        for job in self.job_queue.jobs:
+            if job.finished and job.id not in self.reported_jobs:
+                self.reported_jobs.add(job.id)
+                if job.state == DONE:
+                    messagebox.showinfo("Success", f"{job.label} converted successfully!")
+                elif job.state == FAILED:
+                    messagebox.showerror("Error", f"Conversion of {job.label} failed: {job.error}")
+
+        self.root.after(REFRESH_INTERVAL_MS, self.refresh_jobs)
 
     def play_media(self):
         if not self.selected_file:
@@ -292,8 +353,10 @@ class ConverterApp:
             self.stop_button.configure(state=tk.NORMAL)
             self.forward_button.configure(state=tk.NORMAL)
             self.backward_button.configure(state=tk.NORMAL)
+            self.step_back_button.configure(state=tk.NORMAL)
+            self.step_forward_button.configure(state=tk.NORMAL)
 
-            threading.Thread(target=self.play_video, daemon=True).start()
+            self.play_video()
 
         elif file_extension in [".mp3", ".wav", ".flac"]:
             mixer.music.load(self.selected_file)
@@ -304,43 +367,90 @@ class ConverterApp:
             self.stop_button.configure(state=tk.NORMAL)
 
     def play_video(self):
-        self.cap = cv2.VideoCapture(self.selected_file)
-        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        """Start the decode thread and drain its frame buffer from the Tk main loop."""
+        if self.video_engine:
+            self.video_engine.stop()
+        self.video_engine = VideoEngine(
+            self.selected_file, buffer_depth=self.frame_buffer_depth, cache_bytes=self.frame_cache_mb * 1024 * 1024
+        )
+        self.total_frames = self.video_engine.total_frames
+        self.display_sink.set_source_size(self.video_engine.frame_width, self.video_engine.frame_height)
+        self.video_engine.set_target_size(*self.display_sink.target_size)
+        self.video_engine.start()
+        self.load_thumbnails()
+        self.update_video_frame()
+
+    def load_thumbnails(self):
+        """Generate (or load cached) scrub thumbnails for the selected video."""
+        if self.thumbnail_strip and self.thumbnail_strip.path == self.selected_file:
+            return
+        if self.thumbnail_strip:
+            self.thumbnail_strip.cancel()
+        self.thumbnail_strip = ThumbnailStrip(self.selected_file, self.video_engine.duration)
+        self.thumbnail_strip.start()
+        self.scrub_preview.strip = self.thumbnail_strip
+
+    def update_video_frame(self):
+        """Show the next due frame from the decode thread and reschedule on the Tk loop."""
+        engine = self.video_engine
+        if engine is None:
+            return
+        if not self.media_playing:
+            engine.stop()
+            return
+        engine.loop = self.auto_repeat_var.get()
+        engine.set_target_size(*self.display_sink.target_size)
 
-        while self.cap.isOpened() and self.media_playing:
-            if self.media_paused:
-                time.sleep(0.1)
-                continue
+        video_frame = engine.next_frame()
+        if video_frame is not None:
+            self.show_video_frame(video_frame)
 
-            ret, frame = self.cap.read()
-            if not ret:
-                if self.auto_repeat_var.get():
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                else:
-                    break  
+            # Report measured against target frame rate about twice a second
+            if not self.media_paused and self.current_frame % max(1, int(engine.fps / 2)) == 0:
+                self.fps_label.configure(text=f"{engine.measured_fps:.1f} / {engine.fps:.2f} fps")
 
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            width, height = self.video_label.winfo_width(), self.video_label.winfo_height()
-            frame = cv2.resize(frame, (width, height))
+        if engine.finished:
+            engine.stop()
+            self.media_playing = False
+            self.play_button.configure(state=tk.NORMAL)
+            self.pause_button.configure(state=tk.DISABLED)
+            self.stop_button.configure(state=tk.DISABLED)
+            return
 
-            img = Image.fromarray(frame)
-            imgtk = ImageTk.PhotoImage(image=img)
+        self.root.after(engine.poll_interval_ms, self.update_video_frame)
 
-            self.video_label.configure(image=imgtk)
-            self.video_label.image = imgtk
+    def show_video_frame(self, video_frame):
+        self.display_sink.show(video_frame.image)
+        self.current_frame = video_frame.index
+        self.video_progress_var.set(self.current_frame / max(self.total_frames, 1))
 
-            self.current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-            self.video_progress_var.set(self.current_frame / self.total_frames)
+    def step_frame(self, delta):
+        """Pause and move by single frames, served from the decoded-frame cache when possible."""
+        if not self.video_engine:
+            return
+        if not self.media_paused:
+            self.pause_media()
+        video_frame = self.video_engine.step(delta)
+        if video_frame is not None:
+            self.show_video_frame(video_frame)
+        cache = self.video_engine.frame_cache
+        self.fps_label.configure(text=f"cache {cache.hits} hit / {cache.misses} miss, "
+                                      f"buffer {self.video_engine.buffer_hits} hit, {cache.size_bytes // (1024 * 1024)} MB")
 
-            self.root.update_idletasks()
-            self.root.update()
+    def step_back(self):
+        self.step_frame(-1)
 
-        self.cap.release()
+    def step_forward(self):
+        self.step_frame(1)
 
     def pause_media(self):
         self.media_paused = not self.media_paused
         self.pause_button.configure(text="▶ Resume" if self.media_paused else "⏸ Pause")
+        if self.video_engine:
+            if self.media_paused:
+                self.video_engine.pause()
+            else:
+                self.video_engine.resume()
 
     def stop_media(self):
         self.media_playing = False
@@ -350,21 +460,19 @@ class ConverterApp:
         self.video_progress_var.set(0)
 
     def forward_video(self):
-        if self.cap:
-            self.current_frame += 300  # Forward by 10 seconds (300 frames approx)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+        if self.video_engine:
+            self.video_engine.seek_time(self.video_engine.position + 10)  # Forward by 10 seconds
 
     def backward_video(self):
-        if self.cap:
-            self.current_frame -= 300  # Backward by 10 seconds (300 frames approx)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+        if self.video_engine:
+            self.video_engine.seek_time(self.video_engine.position - 10)  # Backward by 10 seconds
 
     def seek_video(self, event):
         """Seek to a specific position in the video based on progress bar click."""
-        if self.cap:
+        if self.video_engine:
             progress = event.x / self.video_progress_bar.winfo_width()
             self.current_frame = int(progress * self.total_frames)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+            self.video_engine.seek(self.current_frame)
 
     def full_screen(self):
         self.root.attributes("-fullscreen", True)
@@ -378,39 +486,84 @@ class ConverterApp:
     def start_recording(self):
         self.output_file = filedialog.asksaveasfilename(defaultextension=".mp4")
         if self.output_file:
-            self.recording = True
-            self.paused = False
+            crf = QUALITY_CRF.get(self.recording_quality_var.get(), DEFAULT_CRF)
+            self.recorder = ScreenRecorder(self.output_file, crf=crf)
+            try:
+                self.recorder.start()
+            except (CaptureError, RecordingError) as e:
+                self.recorder = None
+                messagebox.showerror("Error", f"Screen recording is not available: {e}")
+                return
             self.record_button.configure(state=tk.DISABLED, fg_color="green")
-            self.pause_resume_button.configure(state=tk.NORMAL)
+            self.pause_resume_button.configure(state=tk.NORMAL, text="⏸ Pause")
             self.stop_rec_button.configure(state=tk.NORMAL)
-            self.recording_thread = threading.Thread(target=self.record_screen, daemon=True)
-            self.recording_thread.start()
+            self.replay_button.configure(state=tk.DISABLED)
 
     def pause_resume_recording(self):
-        self.paused = not self.paused
-        self.pause_resume_button.configure(text="▶ Resume" if self.paused else "⏸ Pause")
+        if self.recorder.paused:
+            self.recorder.resume()
+        else:
+            self.recorder.pause()
+        self.pause_resume_button.configure(text="▶ Resume" if self.recorder.paused else "⏸ Pause")
 
     def stop_recording(self):
-        self.recording = False
+        stats = self.recorder.stop()
+        error = self.recorder.error
+        self.recorder = None
         self.record_button.configure(state=tk.NORMAL, fg_color="#1f6aa5")
         self.pause_resume_button.configure(state=tk.DISABLED)
         self.stop_rec_button.configure(state=tk.DISABLED)
-        messagebox.showinfo("Success", "Recording saved successfully!")
-
-    def record_screen(self):
-        screen_size = pyautogui.size()
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        out = cv2.VideoWriter(self.output_file, fourcc, 20.0, screen_size)
-
-        while self.recording:
-            if not self.paused:
-                img = pyautogui.screenshot()
-                frame = np.array(img)
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                out.write(frame)
-            time.sleep(0.05)
-
-        out.release()
+        self.replay_button.configure(state=tk.NORMAL)
+        print(stats.report())
+        if error:
+            messagebox.showerror("Error", f"Recording stopped early: {error}")
+        else:
+            messagebox.showinfo("Success", "Recording saved successfully!")
+
+    def toggle_replay_buffer(self):
+        """Start or stop keeping the last seconds of screen in memory."""
+        if self.recorder is not None:
+            print(self.recorder.stop().report())
+            self.recorder = None
+            self.replay_button.configure(text="⏪ Replay Buffer", fg_color="#1f6aa5")
+            self.save_replay_button.configure(state=tk.DISABLED)
+            self.record_button.configure(state=tk.NORMAL)
+            return
+        crf = QUALITY_CRF.get(self.recording_quality_var.get(), DEFAULT_CRF)
+        self.recorder = ScreenRecorder(None, crf=crf, replay_seconds=DEFAULT_REPLAY_SECONDS)
+        try:
+            self.recorder.start()
+        except (CaptureError, RecordingError) as e:
+            self.recorder = None
+            messagebox.showerror("Error", f"Replay buffer is not available: {e}")
+            return
+        self.replay_button.configure(text="⏹ Stop Replay Buffer", fg_color="green")
+        self.save_replay_button.configure(state=tk.NORMAL)
+        self.record_button.configure(state=tk.DISABLED)
+
+    def save_replay(self, event=None):
+        """Save the replay buffer; the clip is cut on a worker thread right away, so the file dialog does not delay it."""
+        if self.recorder is None or not self.recorder.replay_seconds:
+            return
+        # MPEG-TS like the ring itself; it is remuxed into whatever container the user picks
+        handle, clip = tempfile.mkstemp(suffix=".ts")
+        os.close(handle)
+        cut = self.replay_saver.submit(self.recorder.save_replay, clip)
+        output_file = filedialog.asksaveasfilename(defaultextension=".mp4", filetypes=REPLAY_FILETYPES)
+        # One worker: this runs once the cut is done
+        self.replay_saver.submit(self.finish_replay, cut, clip, output_file)
+
+    def finish_replay(self, cut, clip, output_file):
+        """Worker thread: remux the cut clip into output_file, reporting failures from the Tk main loop."""
+        try:
+            if output_file:
+                cut.result()
+                remux(clip, output_file)
+        except RecordingError as e:
+            message = f"Could not save the replay: {e}"
+            self.root.after(0, lambda: messagebox.showerror("Error", message))
+        finally:
+            os.remove(clip)
 
     # Snip Tool Functions
     def start_snipping(self):
@@ -0,0 +1,214 @@
+import os
+import subprocess
+import time
+
+from ffmpeg_toolchain import audio_codec_args, ffmpeg_path, video_codec_args
+from lazy_imports import lazy_import
+from media_probe import probe_media
+from image_batch import convert_one
+from output_cache import DOCUMENT_TOOLS
+from pdf_raster import DEFAULT_DPI, render_pdf
+from pdf_text import extract_pdf_text
+from stream_plan import plan_streams
+
+# Loaded on first use; a worker converting videos never imports the document stack
+pd = lazy_import("pandas")  # For CSV and Excel handling
+Image = lazy_import("PIL.Image")
+Document = lazy_import("docx", "Document")  # For DOCX handling
+Converter = lazy_import("pdf2docx", "Converter")  # For PDF to DOCX conversion
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac")
+
+# Placeholder "translations": the code is wrapped in a header naming the target language
+CODE_WRAPPERS = {
+    "py": ("# Converted to Python\n", ""),
+    "php": ("<?php\n// Converted to PHP\n", "\n?>"),
+    "c": ("/* Converted to C */\n", ""),
+    "cs": ("// Converted to C#\n", ""),
+    "vb": ("' Converted to VB\n", ""),
+}
+
+
+class ConversionError(Exception):
+    """A conversion that cannot be done, e.g. an unsupported source or target format."""
+
+
+def convert_pdf(source, target_format, output_file, dpi=DEFAULT_DPI, pages=None, tables=False, workers=None):
+    """Convert PDF to other formats.
+
+    Images render `pages` ("1-5,8", default all) at `dpi`; spreadsheets get one
+    row per text line of those pages, plus detected tables if `tables` is set.
+    """
+    if target_format == "docx":
+        cv = Converter(source)
+        cv.convert(output_file, start=0, end=None)
+        cv.close()
+    elif target_format in ["xlsx", "csv"]:
+        extract_pdf_text(source, output_file, target_format, pages, tables)
+    elif target_format == "xls":
+        raise ConversionError("PDF text can be saved as xlsx or csv, not the legacy xls format")
+    elif target_format in ["jpg", "png", "tif", "tiff"]:
+        render_pdf(source, output_file, dpi, pages, workers)
+    else:
+        raise ConversionError("Unsupported target format for PDF!")
+
+
+def convert_docx(source, target_format, output_file):
+    """Convert DOCX to other formats."""
+    if target_format == "pdf":
+        doc = Document(source)
+        doc.save(output_file)
+    elif target_format == "txt":
+        doc = Document(source)
+        text = "\n".join([para.text for para in doc.paragraphs])
+        with open(output_file, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        raise ConversionError("Unsupported target format for DOCX!")
+
+
+def convert_txt(source, target_format, output_file):
+    """Convert TXT to other formats."""
+    if target_format == "docx":
+        doc = Document()
+        with open(source, "r", encoding="utf-8") as file:
+            for line in file:
+                doc.add_paragraph(line.strip())
+        doc.save(output_file)
+    elif target_format in ["xls", "xlsx", "csv"]:
+        with open(source, "r", encoding="utf-8") as file:
+            lines = file.readlines()
+        df = pd.DataFrame([lines])
+        if target_format == "csv":
+            df.to_csv(output_file, index=False)
+        else:
+            df.to_excel(output_file, index=False)
+    elif target_format in ["jpg", "png", "gif"]:
+        img = Image.new("RGB", (800, 600), color="white")
+        img.save(output_file)
+    else:
+        raise ConversionError("Unsupported target format for TXT!")
+
+
+def convert_image(source, target_format, output_file, max_size=None, quality=None, strip_metadata=False):
+    """Convert image formats, optionally fitting the image inside max_size (width, height)."""
+    convert_one(source, output_file, target_format, max_size, quality, strip_metadata)
+
+
+def convert_code(source, target_format, output_file, header=True):
+    """Convert code files between different languages; header=False copies the code unchanged."""
+    if target_format not in CODE_WRAPPERS:
+        raise ConversionError("Unsupported target format for code!")
+    with open(source, "r", encoding="utf-8") as file:
+        code = file.read()
+    prefix, suffix = CODE_WRAPPERS[target_format] if header else ("", "")
+    with open(output_file, "w", encoding="utf-8") as file:
+        file.write(prefix + code + suffix)
+
+
+def video_settings(target_format):
+    """High-quality (video args, audio args) used for video conversions."""
+    return video_codec_args(target_format, crf=18, preset="slow"), audio_codec_args(target_format, bitrate="320k")
+
+
+def audio_command(source, target_format, output_file):
+    """FFmpeg command for an audio conversion and the planner's notes on it."""
+    try:
+        media = probe_media(source)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        media = None
+    # Copy the audio when the target container can hold its codec, otherwise re-encode
+    plan = plan_streams(media, target_format)
+    return [ffmpeg_path(), "-i", source, *plan.args, output_file], plan.notes
+
+
+def run_ffmpeg(command, threads=None):
+    """Run an FFmpeg command to completion without a console prompt; raises ConversionError."""
+    command = [command[0], "-nostdin", "-y", "-v", "error", *command[1:]]
+    if threads:
+        command[-1:-1] = ["-threads", str(threads)]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0 or not os.path.exists(command[-1]):
+        raise ConversionError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"FFmpeg exited with code {result.returncode}")
+
+
+def media_command(source, target_format, output_file):
+    """FFmpeg command (and planner notes) for a video or audio source."""
+    if os.path.splitext(source)[1].lower() in AUDIO_EXTENSIONS:
+        return audio_command(source, target_format, output_file)
+    video_args, audio_args = video_settings(target_format)
+    return [ffmpeg_path(), "-i", source, *video_args, *audio_args, output_file], []
+
+
+def convert_video(source, target_format, output_file, threads=None):
+    """Convert video formats."""
+    run_ffmpeg(media_command(source, target_format, output_file)[0], threads)
+
+
+def convert_audio(source, target_format, output_file, threads=None):
+    """Convert audio formats."""
+    run_ffmpeg(media_command(source, target_format, output_file)[0], threads)
+
+
+CONVERTERS = {
+    ".pdf": convert_pdf,
+    ".docx": convert_docx,
+    ".txt": convert_txt,
+    ".jpg": convert_image,
+    ".png": convert_image,
+    ".gif": convert_image,
+    **{ext: convert_video for ext in VIDEO_EXTENSIONS},
+    **{ext: convert_audio for ext in AUDIO_EXTENSIONS},
+    ".php": convert_code,
+    ".py": convert_code,
+    ".c": convert_code,
+    ".cs": convert_code,
+    ".vb": convert_code,
+}
+
+
+def cache_settings(source, target_format, options=None):
+    """Settings and tools that decide a conversion's output, for the output cache key."""
+    ext = os.path.splitext(source)[1].lower()
+    if ext in VIDEO_EXTENSIONS or ext in AUDIO_EXTENSIONS:
+        return media_command(source, target_format, "")[0][3:-1], ("ffmpeg",)
+    if CONVERTERS.get(ext) is convert_code:
+        return options or None, ()
+    return options or None, DOCUMENT_TOOLS
+
+
+def convert(source, target_format, output_file, cache=None, threads=None, **options):
+    """Convert `source` to `target_format` at `output_file`; returns True if it came from the cache.
+
+    `options` go to the PDF converter (dpi, pages, tables), the image
+    converter (max_size, quality, strip_metadata) or the code converter
+    (header). Raises ConversionError for unsupported sources and targets.
+    """
+    ext = os.path.splitext(source)[1].lower()
+    converter = CONVERTERS.get(ext)
+    if converter is None:
+        raise ConversionError(f"Unsupported file format: {ext or source}")
+
+    if converter is convert_pdf and target_format == "csv" and options.get("tables"):
+        # The tables land in a second file, and a cache entry holds a single output
+        cache = None
+    key = None
+    if cache is not None:
+        key = cache.key(source, target_format, *cache_settings(source, target_format, options))
+        if cache.fetch(key, output_file):
+            return True
+
+    started = time.time()
+    if converter in (convert_video, convert_audio):
+        converter(source, target_format, output_file, threads)
+    elif converter is convert_pdf:
+        converter(source, target_format, output_file, workers=threads, **options)
+    elif converter in (convert_image, convert_code):
+        converter(source, target_format, output_file, **options)
+    else:
+        converter(source, target_format, output_file)
+    # Only cache what this call wrote, never a stale file that happened to be there
+    if key is not None and os.path.exists(output_file) and os.path.getmtime(output_file) >= started - 1:
+        cache.store(key, output_file)
+    return False
@@ -0,0 +1,443 @@
+"""Local HTTP conversion service on asyncio, with no third-party dependencies.
+
+    python conversion_service.py --port 8765 --workers 4
+
+    POST /uploads?filename=talk.mkv     body streamed to disk (Content-Length or chunked)
+    POST /jobs                          {"upload": "<id>", "to": "mp4"}
+    GET  /jobs/<id>                     job status as JSON
+    GET  /jobs/<id>/events              server-sent events until the job finishes
+    GET  /jobs/<id>/output              converted file, honours Range requests
+    GET  /health
+
+Jobs wait in a bounded queue; when it is full POST /jobs answers 429.
+Finished jobs are forgotten --ttl seconds after they end, and their output
+and upload files are deleted with them; so are uploads no job ever used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from app_cache import CACHE_ROOT
+from conversion_core import AUDIO_EXTENSIONS, CONVERTERS, VIDEO_EXTENSIONS, media_command
+from convert_cli import run_job
+from ffmpeg_jobs import DONE, FFmpegJob, FFmpegJobQueue
+from output_cache import OutputCache
+
+CHUNK_SIZE = 256 * 1024
+# Upload bytes gathered before one write on a worker thread, so the event loop never waits on the disk
+WRITE_BATCH = 4 * 1024 * 1024
+DEFAULT_TTL = 3600
+# How often expired jobs and uploads are looked for
+SWEEP_INTERVAL = 60
+MAX_HEADER_LINES = 100
+# How often running jobs are checked for progress changes (SSE and media jobs)
+POLL_INTERVAL = 0.25
+
+# Service job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "done"
+FAILED = "failed"
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+class Request:
+    """Parsed request line and headers; the body is left on the stream."""
+
+    def __init__(self, method, target, headers):
+        url = urlsplit(target)
+        self.method = method
+        self.path = unquote(url.path)
+        self.query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self.headers = headers
+
+    @property
+    def keep_alive(self):
+        return self.headers.get("connection", "").lower() != "close"
+
+
+class Upload:
+    """An uploaded source file; `touched` is when it was uploaded or a job using it last finished."""
+
+    def __init__(self, path, filename):
+        self.path = path
+        self.filename = filename
+        self.touched = time.time()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ServiceJob:
+    """One conversion requested over HTTP."""
+
+    def __init__(self, source, filename, target_format, output_file):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.filename = filename
+        self.target_format = target_format
+        self.output_file = output_file
+        self.state = QUEUED
+        self.progress = 0.0
+        self.error = None
+        self.cached = False
+        self.notes = []
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "progress": round(self.progress, 3),
+            "error": self.error,
+            "cached": self.cached,
+            "notes": self.notes,
+            "queued_seconds": round((self.started or time.time()) - self.created, 3),
+            "run_seconds": round((self.finished or time.time()) - self.started, 3) if self.started else None,
+        }
+
+
+async def read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return Request(method, target, headers)
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise HTTPError(431)
+
+
+async def iter_body(reader, headers):
+    """Yield the request body in chunks, for Content-Length and chunked transfer encoding."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # Trailers are ignored
+                return
+            while size:
+                data = await reader.read(min(size, CHUNK_SIZE))
+                if not data:
+                    raise HTTPError(400, "Body ended early")
+                size -= len(data)
+                yield data
+            await reader.readexactly(2)
+    else:
+        remaining = int(headers.get("content-length", 0))
+        while remaining:
+            data = await reader.read(min(remaining, CHUNK_SIZE))
+            if not data:
+                raise HTTPError(400, "Body ended early")
+            remaining -= len(data)
+            yield data
+
+
+async def read_json(reader, headers, limit=64 * 1024):
+    body = b""
+    async for data in iter_body(reader, headers):
+        body += data
+        if len(body) > limit:
+            raise HTTPError(413)
+    try:
+        return json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Body is not JSON")
+
+
+def head(status, headers):
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer, status, data, keep_alive=True):
+    body = json.dumps(data).encode("utf-8")
+    writer.write(head(status, {
+        "Content-Type": "application/json",
+        "Content-Length": len(body),
+        "Connection": "keep-alive" if keep_alive else "close",
+    }) + body)
+    await writer.drain()
+
+
+def parse_range(value, size):
+    """Return (start, end) inclusive for a single "bytes=" range, or None to send the whole file."""
+    if not value or not value.startswith("bytes=") or "," in value:
+        return None
+    first, _, last = value[6:].strip().partition("-")
+    try:
+        if first == "":
+            start, end = max(0, size - int(last)), size - 1  # Suffix range: the last N bytes
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPError(416)
+    return start, end
+
+
+class ConversionService:
+    """Uploads, a bounded job queue and a worker pool behind a small HTTP/1.1 server."""
+
+    def __init__(self, data_dir, workers=None, queue_size=64, max_upload_bytes=8 * 1024 ** 3, ttl=DEFAULT_TTL):
+        self.upload_dir = os.path.join(data_dir, "uploads")
+        self.output_dir = os.path.join(data_dir, "outputs")
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_upload_bytes = max_upload_bytes
+        self.ttl = ttl
+        self.uploads = {}
+        self.jobs = {}
+        self.pending = asyncio.Queue(maxsize=queue_size)
+        self.output_cache = OutputCache()
+        # Media runs as FFmpeg subprocesses with live progress; everything else in worker processes
+        self.media_queue = FFmpegJobQueue(workers=self.workers, encoder_threads=max(1, (os.cpu_count() or 1) // self.workers))
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._worker_tasks = []
+
+    async def serve(self, host, port):
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._worker_tasks.append(asyncio.create_task(self._sweeper()))
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f"Conversion service on http://{host}:{port} with {self.workers} workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.media_queue.shutdown()
+            self.pool.shutdown(cancel_futures=True)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.pending.get()
+            job.state = RUNNING
+            job.started = time.time()
+            try:
+                ext = os.path.splitext(job.source)[1].lower()
+                if ext in VIDEO_EXTENSIONS or ext in AUDIO_EXTENSIONS:
+                    await self._run_media(job)
+                else:
+                    result = await loop.run_in_executor(self.pool, run_job, {"source": job.source, "to": job.target_format, "output": job.output_file}, True, 1)
+                    job.cached = result.get("cached", False)
+                    job.error = result.get("error")
+                    job.state = SUCCEEDED if result["status"] == "ok" else FAILED
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.state = FAILED
+            job.progress = 1.0 if job.state == SUCCEEDED else job.progress
+            job.finished = time.time()
+            self.pending.task_done()
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            self.evict_expired()
+
+    def evict_expired(self, now=None):
+        """Forget jobs finished more than ttl seconds ago and delete their outputs, then unused uploads."""
+        now = time.time() if now is None else now
+        for job in list(self.jobs.values()):
+            if job.finished is not None and now - job.finished > self.ttl:
+                del self.jobs[job.id]
+                _remove_file(job.output_file)
+        in_use = {}
+        for job in self.jobs.values():
+            # A finished job keeps its upload alive until the job itself expires
+            in_use[job.source] = max(in_use.get(job.source, 0.0), job.finished or now)
+        for upload_id, upload in list(self.uploads.items()):
+            if now - max(upload.touched, in_use.get(upload.path, 0.0)) > self.ttl:
+                del self.uploads[upload_id]
+                _remove_file(upload.path)
+
+    async def _run_media(self, job):
+        command, notes = await asyncio.to_thread(media_command, job.source, job.target_format, job.output_file)
+        ffmpeg_job = FFmpegJob([command[0], "-y", *command[1:]], job.output_file, label=job.filename)
+        ffmpeg_job.notes.extend(notes)
+        ffmpeg_job.use_cache(self.output_cache, job.source, job.target_format, command[3:-1])
+        self.media_queue.submit_job(ffmpeg_job)
+        while not ffmpeg_job.finished:
+            job.progress = ffmpeg_job.progress
+            await asyncio.sleep(POLL_INTERVAL)
+        job.notes = ffmpeg_job.notes
+        job.cached = "output: reused from the conversion cache" in ffmpeg_job.notes
+        job.error = ffmpeg_job.error
+        job.state = SUCCEEDED if ffmpeg_job.state == DONE else FAILED
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                try:
+                    keep_alive = await self._route(request, reader, writer)
+                except HTTPError as e:
+                    headers = {"Content-Range": f"bytes */{e.size}"} if getattr(e, "size", None) is not None else {}
+                    body = json.dumps({"error": str(e)}).encode("utf-8")
+                    writer.write(head(e.status, {"Content-Type": "application/json", "Content-Length": len(body), "Connection": "close", **headers}) + body)
+                    await writer.drain()
+                    break  # The body may not have been read; the connection cannot be reused
+                if not (keep_alive and request.keep_alive):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, HTTPError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, request, reader, writer):
+        """Handle one request; returns whether the connection may serve another one."""
+        parts = [part for part in request.path.split("/") if part]
+        if request.method == "GET" and parts == ["health"]:
+            await send_json(writer, 200, {"ok": True, "queued": self.pending.qsize(), "jobs": len(self.jobs)})
+        elif request.method == "POST" and parts == ["uploads"]:
+            await self._upload(request, reader, writer)
+        elif request.method == "POST" and parts == ["jobs"]:
+            await self._create_job(request, reader, writer)
+        elif request.method == "GET" and len(parts) == 2 and parts[0] == "jobs":
+            await send_json(writer, 200, self._job(parts[1]).snapshot())
+        elif request.method == "GET" and len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            await self._events(self._job(parts[1]), writer)
+            return False
+        elif request.method in ("GET", "HEAD") and len(parts) == 3 and parts[0] == "jobs" and parts[2] == "output":
+            await self._output(request, self._job(parts[1]), writer)
+        else:
+            raise HTTPError(404)
+        return True
+
+    def _job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, "No such job")
+        return job
+
+    async def _upload(self, request, reader, writer):
+        filename = os.path.basename(request.query.get("filename", ""))
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in CONVERTERS:
+            raise HTTPError(415, f"Unsupported file format: {ext or 'none'}")
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(self.upload_dir, upload_id + ext)
+        size = 0
+        batch, batch_size = [], 0
+        try:
+            with open(path, "wb") as file:
+                async for data in iter_body(reader, request.headers):
+                    size += len(data)
+                    if size > self.max_upload_bytes:
+                        raise HTTPError(413)
+                    batch.append(data)
+                    batch_size += len(data)
+                    if batch_size >= WRITE_BATCH:
+                        await asyncio.to_thread(file.writelines, batch)
+                        batch, batch_size = [], 0
+                await asyncio.to_thread(file.writelines, batch)
+        except BaseException:
+            os.remove(path)
+            raise
+        self.uploads[upload_id] = Upload(path, filename)
+        await send_json(writer, 201, {"upload": upload_id, "size": size})
+
+    async def _create_job(self, request, reader, writer):
+        body = await read_json(reader, request.headers)
+        upload = self.uploads.get(body.get("upload"))
+        target_format = str(body.get("to", "")).lower().strip(".")
+        if upload is None or not target_format.isalnum():
+            raise HTTPError(400, "Need an existing upload id and a target format")
+        upload.touched = time.time()
+        job = ServiceJob(upload.path, upload.filename, target_format, os.path.join(self.output_dir, f"{uuid.uuid4().hex}.{target_format}"))
+        try:
+            self.pending.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HTTPError(429, "Job queue is full, retry later")
+        self.jobs[job.id] = job
+        await send_json(writer, 202, {"job": job.id, "position": self.pending.qsize()})
+
+    async def _events(self, job, writer):
+        writer.write(head(200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "Connection": "close"}))
+        last = None
+        while True:
+            snapshot = job.snapshot()
+            state = (snapshot["state"], snapshot["progress"])
+            if state != last:
+                writer.write(f"event: {snapshot['state']}\ndata: {json.dumps(snapshot)}\n\n".encode("utf-8"))
+                await writer.drain()
+                last = state
+            if job.state in (SUCCEEDED, FAILED):
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _output(self, request, job, writer):
+        if job.state != SUCCEEDED:
+            raise HTTPError(409, f"Job is {job.state}")
+        size = os.path.getsize(job.output_file)
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except HTTPError as e:
+            e.size = size
+            raise
+        start, end = byte_range or (0, size - 1)
+        count = max(0, end - start + 1)
+        name = os.path.splitext(job.filename)[0] + "." + job.target_format
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "Content-Length": count,
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f'attachment; filename="{name}"',
+        }
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        writer.write(head(206 if byte_range else 200, headers))
+        await writer.drain()
+        if request.method == "GET" and count:
+            with open(job.output_file, "rb") as file:
+                # Zero-copy where the transport supports it, plain reads otherwise
+                await asyncio.get_running_loop().sendfile(writer.transport, file, start, count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP conversion service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="concurrent conversions (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=64, help="jobs that may wait before POST /jobs returns 429")
+    parser.add_argument("--data-dir", default=os.path.join(CACHE_ROOT, "service"), help="where uploads and outputs are kept")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="seconds finished jobs, their files and unused uploads are kept")
+    args = parser.parse_args(argv)
+    service = ConversionService(args.data_dir, args.workers, args.queue_size, ttl=args.ttl)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
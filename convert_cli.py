@@ -0,0 +1,138 @@
+"""Headless batch conversion.
+
+    python convert_cli.py --to pdf "docs/**/*.docx"
+    python convert_cli.py --manifest jobs.jsonl --out-dir out --workers 8
+    python convert_cli.py --to png --dpi 300 --pages 1-20 scan.pdf
+
+Inputs are glob patterns and/or manifest files. A manifest has one job per
+line: either a plain source path (converted to --to) or a JSON object with
+"source" and optional "to", "output", "dpi", "pages" and "tables" keys. One
+JSON line per job is written to stdout as it finishes. The exit status is 0
+when every job succeeded, 1 when any failed and 2 for usage errors.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from conversion_core import ConversionError, convert
+from output_cache import OutputCache
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+# Per-job keys passed through to the converter
+OPTION_KEYS = ("dpi", "pages", "tables")
+
+
+def read_manifest(path, default_format):
+    """Yield (source, target_format, output, options) tuples from a manifest file."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                output = entry.get("output")
+                options = {key: entry[key] for key in OPTION_KEYS if key in entry}
+                yield os.path.join(base, entry["source"]), entry.get("to", default_format), output and os.path.join(base, output), options
+            else:
+                yield os.path.join(base, line), default_format, None, {}
+
+
+def collect_jobs(patterns, manifests, default_format, out_dir, options=None):
+    """Expand globs and manifests into a list of job dicts with resolved output paths."""
+    entries = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        entries.extend((path, default_format, None, {}) for path in matches)
+    for manifest in manifests:
+        entries.extend(read_manifest(manifest, default_format))
+
+    jobs = []
+    for source, target_format, output, job_options in entries:
+        if not target_format:
+            raise ValueError(f"No target format for {source}; pass --to or set \"to\" in the manifest")
+        if output is None:
+            stem = os.path.splitext(os.path.basename(source))[0]
+            output = os.path.join(out_dir or os.path.dirname(source), f"{stem}.{target_format}")
+        jobs.append({"source": source, "to": target_format, "output": output, **(options or {}), **job_options})
+    return jobs
+
+
+def run_job(job, use_cache, threads):
+    """Worker process: convert one file and describe the outcome as a dict."""
+    started = time.time()
+    result = dict(job)
+    try:
+        if not os.path.isfile(job["source"]):
+            raise ConversionError("Source file not found")
+        os.makedirs(os.path.dirname(os.path.abspath(job["output"])), exist_ok=True)
+        options = {key: job[key] for key in OPTION_KEYS if key in job}
+        result["cached"] = convert(job["source"], job["to"], job["output"], OutputCache() if use_cache else None, threads, **options)
+        result["status"] = "ok"
+    except Exception as e:  # Reported per job; one bad file must not stop the batch
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.time() - started, 3)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert files without the GUI.")
+    parser.add_argument("inputs", nargs="*", help="files or glob patterns (quote them; ** recurses)")
+    parser.add_argument("--manifest", action="append", default=[], help="manifest file, one job per line")
+    parser.add_argument("--to", dest="target_format", help="target format, e.g. pdf, mp4, png")
+    parser.add_argument("--out-dir", help="write outputs here instead of next to each source")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel conversions")
+    parser.add_argument("--dpi", type=int, help="resolution for PDF pages rendered to images")
+    parser.add_argument("--pages", help="PDF pages to convert, e.g. 1-5,8 (default: all)")
+    parser.add_argument("--tables", action="store_true", default=None, help="also extract detected tables from PDFs to xlsx/csv")
+    parser.add_argument("--no-cache", action="store_true", help="always convert, never reuse cached outputs")
+    args = parser.parse_args(argv)
+
+    try:
+        options = {key: getattr(args, key) for key in OPTION_KEYS if getattr(args, key) is not None}
+        jobs = collect_jobs(args.inputs, args.manifest, args.target_format, args.out_dir, options)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(str(e))
+    if not jobs:
+        parser.error("no inputs; pass files, globs or --manifest")
+
+    # Jobs writing the same output would race each other; refuse the later ones
+    seen = set()
+    unique_jobs = []
+    failed = 0
+    for job in jobs:
+        key = os.path.abspath(job["output"])
+        if key in seen:
+            print(json.dumps({**job, "status": "error", "error": "Another job writes the same output"}), flush=True)
+            failed += 1
+        else:
+            seen.add(key)
+            unique_jobs.append(job)
+
+    workers = max(1, min(args.workers, len(unique_jobs)))
+    # Share the cores between concurrent FFmpeg processes instead of oversubscribing
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_job, job, not args.no_cache, threads) for job in unique_jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                failed += result["status"] != "ok"
+                print(json.dumps(result), flush=True)
+    except KeyboardInterrupt:
+        return 130
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+import heapq
+import itertools
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Only the stderr banner is matched with a regex; progress comes from -progress key=value lines
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+)\.(\d+)")
+
+_job_ids = itertools.count(1)
+
+
+def _seconds(match):
+    hours, minutes, seconds, fraction = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction) / 10 ** len(fraction)
+
+
+def _number(value, suffix=""):
+    """Parse values like "1.52x" or "2410.3kbits/s"; FFmpeg reports N/A early on."""
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+# -progress key -> (job attribute, parser)
+PROGRESS_FIELDS = {
+    # Negative until the first packet is muxed
+    "out_time_us": ("out_time", lambda value: max(0.0, _number(value) / 1_000_000)),
+    "fps": ("fps", _number),
+    "speed": ("speed", lambda value: _number(value, "x")),
+    "bitrate": ("bitrate", lambda value: _number(value, "kbits/s")),
+    "total_size": ("total_size", lambda value: int(_number(value))),
+}
+
+
+class FFmpegJob:
+    """One queued FFmpeg command and its live progress."""
+
+    def __init__(self, command, output_file, priority=0, label=None):
+        self.id = next(_job_ids)
+        self.command = command
+        self.output_file = output_file
+        self.priority = priority
+        self.label = label or os.path.basename(output_file)
+        self.state = QUEUED
+        self.progress = 0.0
+        self.duration = 0.0
+        self.out_time = 0.0
+        self.fps = 0.0
+        self.speed = 0.0
+        self.bitrate = 0.0
+        self.total_size = 0
+        self.ended = False
+        self.started = False
+        self.returncode = None
+        self.error = None
+        self.process = None
+        self.log = []
+        # Why the command looks the way it does, e.g. which streams are copied
+        self.notes = []
+        # (OutputCache, key arguments) when the output may come from / go to the cache
+        self.cache = None
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def eta(self):
+        """Seconds left at the current encode speed, or None while it is unknown."""
+        if self.duration <= 0 or self.speed <= 0:
+            return None
+        return max(0.0, (self.duration - self.out_time) / self.speed)
+
+    def running_processes(self):
+        """FFmpeg processes currently working for this job."""
+        return [self.process] if self.process is not None else []
+
+    def use_cache(self, cache, source, target_format, settings=None):
+        """Reuse a cached output for the same source and settings, and cache this one on success."""
+        self.cache = (cache, (source, target_format, settings, ("ffmpeg",)))
+
+    def run(self, queue):
+        """Run the job on a queue worker thread; returns True on success."""
+        return self._execute(queue, self)
+
+    def run_cached(self, queue):
+        """Like run(), but served from the output cache when use_cache() was called and it has a hit."""
+        if self.cache is None:
+            return self.run(queue)
+        # Hashing the source happens here on the worker, not on the UI thread
+        cache, key_args = self.cache
+        key = cache.key(*key_args)
+        if cache.fetch(key, self.output_file):
+            self.notes.append("output: reused from the conversion cache")
+            return True
+        if not self.run(queue):
+            return False
+        try:
+            cache.store(key, self.output_file)
+        except OSError as e:
+            print(f"Could not cache {self.output_file}: {e}")
+        return True
+
+    def _execute(self, queue, owner):
+        # `owner` is the job whose pause/cancel state governs this process
+        if not queue.launch(owner, self, queue.prepare_command(self.command)):
+            return False
+        log_thread = threading.Thread(target=self._read_log, daemon=True)
+        log_thread.start()
+        self._read_progress()
+        self.returncode = self.process.wait()
+        log_thread.join()
+        # Some builds exit 0 on input errors; a finished transcode always reports progress=end
+        if self.returncode == 0 and self.ended:
+            return True
+        self.error = "".join(self.log[-5:]).strip() or f"FFmpeg exited with code {self.returncode}"
+        return False
+
+    def _read_progress(self):
+        """Follow the -progress key=value stream on stdout."""
+        fields = PROGRESS_FIELDS
+        for line in self.process.stdout:
+            key, _, value = line.partition("=")
+            field = fields.get(key)
+            if field is None:
+                if key == "progress" and value.strip() == "end":
+                    self.ended = True
+                continue
+            name, parse = field
+            setattr(self, name, parse(value))
+            if name == "out_time" and self.duration > 0:
+                self.progress = min(1.0, self.out_time / self.duration)
+
+    def _read_log(self):
+        """Keep the stderr tail for error reports and pick the input duration out of the banner."""
+        for line in self.process.stderr:
+            self.log.append(line)
+            del self.log[:-50]
+            if not self.duration:
+                match = DURATION_RE.search(line)
+                if match:
+                    self.duration = _seconds(match)
+
+
+class FFmpegJobQueue:
+    """Runs FFmpeg jobs by priority on a bounded number of worker threads."""
+
+    def __init__(self, workers=None, encoder_threads=4):
+        self.encoder_threads = encoder_threads
+        # Enough concurrent encodes to fill the machine without oversubscribing it
+        self.workers = workers or max(1, (os.cpu_count() or 1) // encoder_threads)
+        self.jobs = []
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._shutdown = False
+        self._running = 0  # Jobs a worker is busy with
+        self._borrowed = 0  # Idle worker slots lent to extra processes of running jobs
+
+    def submit(self, command, output_file, priority=0, label=None):
+        """Queue a command; higher priority jobs start first."""
+        return self.submit_job(FFmpegJob(command, output_file, priority, label))
+
+    def submit_job(self, job):
+        """Queue an already built job, e.g. a subclass that runs several commands."""
+        with self._cond:
+            self.jobs.append(job)
+            heapq.heappush(self._heap, (-job.priority, next(self._seq), job))
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker, daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return job
+
+    def cancel(self, job):
+        with self._cond:
+            if job.finished:
+                return
+            if job.state == PAUSED:
+                self._signal(job, resume=True)
+            for process in job.running_processes():
+                process.terminate()
+            job.state = CANCELLED
+            self._cond.notify_all()
+
+    def pause(self, job):
+        """Hold a queued job back, or suspend a running one (POSIX only)."""
+        with self._cond:
+            if job.state == QUEUED:
+                job.state = PAUSED
+            elif job.state == RUNNING and self._signal(job, resume=False):
+                job.state = PAUSED
+
+    def resume(self, job):
+        with self._cond:
+            if job.state != PAUSED:
+                return
+            if not job.started:
+                job.state = QUEUED
+                heapq.heappush(self._heap, (-job.priority, next(self._seq), job))
+                self._cond.notify()
+            elif self._signal(job, resume=True):
+                job.state = RUNNING
+
+    def active_jobs(self):
+        return [job for job in self.jobs if not job.finished]
+
+    def shutdown(self):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        for job in self.active_jobs():
+            self.cancel(job)
+
+    def _signal(self, job, resume):
+        if sys.platform == "win32":
+            return False
+        for process in job.running_processes():
+            if process.poll() is None:
+                process.send_signal(signal.SIGCONT if resume else signal.SIGSTOP)
+        return True
+
+    def prepare_command(self, command):
+        """Add the progress pipe and the per-encoder thread cap to an FFmpeg command."""
+        command = list(command)
+        # Machine-readable progress on stdout instead of the human stats line on stderr
+        command[1:1] = ["-progress", "pipe:1", "-nostats"]
+        if "-threads" not in command:
+            # Output option, so it goes right before the output file
+            command[-1:-1] = ["-threads", str(self.encoder_threads)]
+        return command
+
+    def launch(self, owner, job, command):
+        """Start `job`'s process unless `owner` was cancelled; returns False if it was."""
+        with self._cond:
+            if owner.state == CANCELLED:
+                return False
+            job.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            if owner.state == PAUSED:
+                # Paused while between commands; the new process waits for resume too
+                self._signal(owner, resume=False)
+            return True
+
+    def borrow_slot(self):
+        """Take an idle worker slot for one more process of a running job; returns False if none is idle.
+
+        Jobs that run several FFmpeg processes at once (SegmentedJob) stay within
+        the queue's worker limit this way. Hand the slot back with return_slot().
+        """
+        with self._cond:
+            if self._running + self._borrowed >= self.workers:
+                return False
+            self._borrowed += 1
+            return True
+
+    def return_slot(self):
+        with self._cond:
+            self._borrowed -= 1
+            self._cond.notify()
+
+    def _next_job(self):
+        with self._cond:
+            while not self._shutdown:
+                # Borrowed slots count against the limit until they are returned
+                while self._heap and self._running + self._borrowed < self.workers:
+                    _, _, job = heapq.heappop(self._heap)
+                    # Cancelled or paused jobs stay in the heap until a worker skips them
+                    if job.state == QUEUED:
+                        job.state = RUNNING
+                        job.started = True
+                        self._running += 1
+                        return job
+                self._cond.wait()
+            return None
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._cond.notify()
+
+    def _run(self, job):
+        try:
+            ok = job.run_cached(self)
+        except Exception as e:
+            # Whatever went wrong, the job must end FAILED and this worker must live on
+            job.error = str(e) or type(e).__name__
+            ok = False
+            for process in job.running_processes():
+                if process.poll() is None:
+                    process.kill()
+
+        with self._cond:
+            if job.state == CANCELLED:
+                return
+            if ok:
+                job.progress = 1.0
+                job.state = DONE
+            else:
+                job.error = job.error or f"FFmpeg exited with code {job.returncode}"
+                job.state = FAILED
@@ -0,0 +1,190 @@
+import os
+import re
+import shutil
+import subprocess
+
+from app_cache import file_key, load_json, save_json
+
+# Encoders to try for each codec family, best first. Software encoders lead because
+# the quality options used by the apps (-crf/-preset) are theirs.
+VIDEO_ENCODERS = {
+    "h264": ["libx264", "h264_nvenc", "h264_qsv", "h264_videotoolbox", "h264_amf", "h264_vaapi"],
+    "hevc": ["libx265", "hevc_nvenc", "hevc_qsv", "hevc_videotoolbox", "hevc_amf", "hevc_vaapi"],
+    "vp9": ["libvpx-vp9", "vp9_qsv", "vp9_vaapi"],
+    "mpeg4": ["mpeg4", "libxvid"],
+    "gif": ["gif"],
+}
+AUDIO_ENCODERS = {
+    "aac": ["aac", "libfdk_aac"],
+    "mp3": ["libmp3lame", "libshine"],
+    "opus": ["libopus", "opus"],
+    "vorbis": ["libvorbis", "vorbis"],
+    "flac": ["flac"],
+    "pcm": ["pcm_s16le"],
+}
+
+# Codec families each target container gets when re-encoding: (video, audio)
+TARGET_CODECS = {
+    "mp4": ("h264", "aac"),
+    "mov": ("h264", "aac"),
+    "mkv": ("h264", "aac"),
+    "avi": ("mpeg4", "mp3"),
+    "webm": ("vp9", "opus"),
+    "gif": ("gif", None),
+    "mp3": (None, "mp3"),
+    "wav": (None, "pcm"),
+    "flac": (None, "flac"),
+    "ogg": (None, "vorbis"),
+    "m4a": (None, "aac"),
+    "aac": (None, "aac"),
+}
+
+_CODEC_LINE = re.compile(r"^ ([VAS])[A-Z.]{5} (\S+)")
+# Release versions look like "6.0-static", "n5.1.2" or "4.4.2-0ubuntu0.22.04.1"
+_VERSION = re.compile(r"n?(\d+)\.(\d+)")
+
+# Probed once per process; the on-disk record makes later launches free
+_toolchain = None
+
+
+def _run(path, *args):
+    result = subprocess.run([path, "-hide_banner", *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    return result.stdout
+
+
+def _parse_codecs(output):
+    """Map codec name to its type letter (V/A/S) from -encoders/-decoders output."""
+    codecs = {}
+    for line in output.splitlines():
+        match = _CODEC_LINE.match(line)
+        if match and match.group(2) != "=":
+            codecs[match.group(2)] = match.group(1)
+    return codecs
+
+
+def _probe(ffmpeg_path):
+    version_line = _run(ffmpeg_path, "-version").splitlines()[0]
+    ffprobe_path = shutil.which("ffprobe")
+    if ffprobe_path is None:
+        # Builds unpacked next to the app ship ffprobe beside ffmpeg
+        sibling = os.path.join(os.path.dirname(ffmpeg_path), "ffprobe" + os.path.splitext(ffmpeg_path)[1])
+        ffprobe_path = sibling if os.path.exists(sibling) else None
+    return {
+        "ok": True,
+        "ffmpeg": ffmpeg_path,
+        "ffprobe": ffprobe_path,
+        "version": version_line.split()[2] if len(version_line.split()) > 2 else version_line,
+        "encoders": _parse_codecs(_run(ffmpeg_path, "-encoders")),
+        "decoders": _parse_codecs(_run(ffmpeg_path, "-decoders")),
+        "hwaccels": [line.strip() for line in _run(ffmpeg_path, "-hwaccels").splitlines()[1:] if line.strip()],
+    }
+
+
+def probe_toolchain(binary="ffmpeg", refresh=False):
+    """Return the capabilities record for FFmpeg, or None if it is missing or broken.
+
+    The record is cached on disk keyed by the binary's path and mtime, so each
+    FFmpeg build is only probed once.
+    """
+    global _toolchain
+    if _toolchain is not None and not refresh:
+        return _toolchain
+
+    path = shutil.which(binary)
+    if path is None:
+        return None
+
+    key = file_key(path)
+    record = None if refresh else load_json("toolchain", key)
+    if record is None or "encoders" not in record:
+        try:
+            record = _probe(path)
+        except (subprocess.CalledProcessError, OSError, IndexError):
+            record = {"ok": False, "ffmpeg": path}
+        save_json("toolchain", key, record)
+
+    if not record["ok"]:
+        return None
+    _toolchain = record
+    return record
+
+
+def ffmpeg_available(binary="ffmpeg"):
+    """Return True if FFmpeg runs; the answer is cached per binary path and mtime."""
+    return probe_toolchain(binary) is not None
+
+
+def ffmpeg_path():
+    """Path of the probed ffmpeg binary, falling back to whatever is on PATH."""
+    toolchain = probe_toolchain()
+    return toolchain["ffmpeg"] if toolchain else "ffmpeg"
+
+
+def ffprobe_path():
+    toolchain = probe_toolchain()
+    return (toolchain and toolchain["ffprobe"]) or "ffprobe"
+
+
+def ffmpeg_version(toolchain=None):
+    """(major, minor) of the probed FFmpeg, or None for git snapshots and unknown builds."""
+    toolchain = toolchain or probe_toolchain()
+    match = _VERSION.match(toolchain["version"]) if toolchain else None
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def pick_encoder(family, candidates_by_family, toolchain=None):
+    """Return the first encoder of a codec family this FFmpeg build provides."""
+    toolchain = toolchain or probe_toolchain()
+    candidates = candidates_by_family.get(family, [])
+    if toolchain is None:
+        return candidates[0] if candidates else None
+    for name in candidates:
+        if name in toolchain["encoders"]:
+            return name
+    return None
+
+
+def video_codec_args(target_format, crf=None, preset=None, toolchain=None, family=None):
+    """FFmpeg arguments selecting a video encoder for the target container, or for `family` if given."""
+    if family is None:
+        if target_format not in TARGET_CODECS:
+            # Not an audio/video target (an image, say): leave the codec to FFmpeg's muxer
+            return []
+        family = TARGET_CODECS[target_format][0]
+    if family is None:
+        return ["-vn"]
+    encoder = pick_encoder(family, VIDEO_ENCODERS, toolchain)
+    if encoder is None and family != "mpeg4":
+        # Anything can fall back to plain MPEG-4 Part 2
+        encoder = pick_encoder("mpeg4", VIDEO_ENCODERS, toolchain)
+    if encoder is None:
+        return []
+
+    args = ["-c:v", encoder]
+    if crf is not None:
+        if encoder in ("libx264", "libx265"):
+            args += ["-preset", preset or "medium", "-crf", str(crf)]
+        elif encoder == "libvpx-vp9":
+            args += ["-crf", str(crf), "-b:v", "0"]
+        elif encoder.endswith("_nvenc"):
+            args += ["-cq", str(crf)]
+        elif encoder in ("mpeg4", "libxvid"):
+            # Map the x264 CRF scale (0-51) onto mpeg4's qscale (2-31)
+            args += ["-q:v", str(max(2, min(31, round(crf / 51 * 31))))]
+    return args
+
+
+def audio_codec_args(target_format, bitrate=None, toolchain=None):
+    """FFmpeg arguments selecting an audio encoder for the target container."""
+    if target_format not in TARGET_CODECS:
+        return []
+    family = TARGET_CODECS[target_format][1]
+    if family is None:
+        return ["-an"]
+    encoder = pick_encoder(family, AUDIO_ENCODERS, toolchain)
+    if encoder is None:
+        return []
+    args = ["-c:a", encoder]
+    if bitrate and family not in ("flac", "pcm"):
+        args += ["-b:a", bitrate]
+    return args
@@ -0,0 +1,68 @@
+import customtkinter as ctk
+
+from ffmpeg_jobs import CANCELLED, DONE, FAILED, PAUSED, RUNNING
+
+# Job widgets are refreshed at this fixed rate from the Tk main loop, however chatty FFmpeg is
+REFRESH_INTERVAL_MS = 250
+
+
+def job_summary(job):
+    """One-line status: progress plus throughput and ETA while encoding."""
+    text = f"{job.label}  {job.state}  {int(job.progress * 100)}%"
+    if job.state == RUNNING and job.speed > 0:
+        text += f"  {job.fps:.0f} fps  {job.speed:.2f}x"
+        if job.eta is not None:
+            minutes, seconds = divmod(int(job.eta), 60)
+            text += f"  ETA {minutes}:{seconds:02d}"
+    return text
+
+
+class JobPanel:
+    """Scrollable list of FFmpeg jobs with per-job progress, pause and cancel."""
+
+    def __init__(self, parent, job_queue, height=160):
+        self.job_queue = job_queue
+        self.frame = ctk.CTkScrollableFrame(parent, height=height, fg_color="#333", label_text="Jobs")
+        self._rows = {}
+
+    def refresh(self):
+        """Sync the rows with the queue; call from the Tk main loop."""
+        for job in self.job_queue.jobs:
+            row = self._rows.get(job.id)
+            if row is None:
+                row = self._add_row(job)
+            label, bar, pause_button, cancel_button = row
+            text = job_summary(job)
+            if label.cget("text") == text:
+                continue  # Nothing changed since the last tick
+            label.configure(text=text)
+            bar.set(job.progress)
+            pause_button.configure(text="▶" if job.state == PAUSED else "⏸")
+            if job.state in (DONE, FAILED, CANCELLED):
+                pause_button.configure(state="disabled")
+                cancel_button.configure(state="disabled")
+
+    def _add_row(self, job):
+        row_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        row_frame.pack(fill="x", pady=2)
+
+        label = ctk.CTkLabel(row_frame, text=job.label, anchor="w", text_color="white")
+        label.pack(fill="x")
+
+        bar = ctk.CTkProgressBar(row_frame, width=140)
+        bar.pack(side="left", fill="x", expand=True, padx=(0, 4))
+
+        pause_button = ctk.CTkButton(row_frame, text="⏸", width=28, command=lambda: self._toggle_pause(job))
+        pause_button.pack(side="left", padx=2)
+
+        cancel_button = ctk.CTkButton(row_frame, text="✖", width=28, command=lambda: self.job_queue.cancel(job))
+        cancel_button.pack(side="left", padx=2)
+
+        self._rows[job.id] = (label, bar, pause_button, cancel_button)
+        return self._rows[job.id]
+
+    def _toggle_pause(self, job):
+        if job.state == PAUSED:
+            self.job_queue.resume(job)
+        else:
+            self.job_queue.pause(job)
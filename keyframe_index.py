@@ -0,0 +1,65 @@
+import bisect
+import subprocess
+import threading
+
+from app_cache import file_key, load_json, save_json
+from ffmpeg_toolchain import ffprobe_path
+
+
+class KeyframeIndex:
+    """Sorted keyframe timestamps of a video's first video stream."""
+
+    def __init__(self, times):
+        self.times = sorted(times)
+
+    def keyframe_before(self, seconds):
+        """Return the time of the last keyframe at or before `seconds`."""
+        i = bisect.bisect_right(self.times, seconds + 1e-6) - 1
+        return self.times[max(i, 0)] if self.times else 0.0
+
+    @classmethod
+    def probe(cls, path, ffprobe=None):
+        """Read packet flags with ffprobe; only demuxes, nothing is decoded."""
+        command = [
+            ffprobe or ffprobe_path(), "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path,
+        ]
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True, check=True)
+
+        start = None
+        times = []
+        for line in result.stdout.splitlines():
+            pts, _, flags = line.partition(",")
+            if pts in ("", "N/A"):
+                continue
+            pts = float(pts)
+            start = pts if start is None else min(start, pts)
+            if "K" in flags:
+                times.append(pts)
+        # Times are made relative to the stream start so they line up with CAP_PROP_POS_MSEC
+        start = start or 0.0
+        return cls([t - start for t in times])
+
+    @classmethod
+    def load(cls, path, ffprobe=None):
+        """Return the cached index for this file, probing and caching it on a miss."""
+        key = file_key(path)
+        cached = load_json("keyframes", key)
+        if cached is not None:
+            return cls(cached["times"])
+        index = cls.probe(path, ffprobe)
+        save_json("keyframes", key, {"path": path, "times": index.times})
+        return index
+
+    @classmethod
+    def load_in_background(cls, path, callback, ffprobe=None):
+        """Build the index on a daemon thread and hand it to `callback` when ready."""
+        def worker():
+            try:
+                callback(cls.load(path, ffprobe))
+            except (OSError, subprocess.CalledProcessError, ValueError) as e:
+                print(f"Keyframe index unavailable for {path}: {e}")
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
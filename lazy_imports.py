@@ -0,0 +1,67 @@
+import importlib
+import sys
+import time
+
+# Launch with --startup-profile to print how long each deferred import takes
+STARTUP_PROFILE = "--startup-profile" in sys.argv
+STARTUP_T0 = time.perf_counter()
+
+
+def timed_import(name):
+    """Import a module, printing its cost when startup profiling is on."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if STARTUP_PROFILE:
+        print(f"[startup] import {name}: {(time.perf_counter() - start) * 1000:.1f} ms")
+    return module
+
+
+def report_startup(label):
+    """Print the time since launch for a startup milestone."""
+    if STARTUP_PROFILE:
+        print(f"[startup] {label}: {(time.perf_counter() - STARTUP_T0) * 1000:.1f} ms after launch")
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = timed_import(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+class LazyAttribute:
+    """Stands in for `from module import name` and imports on first use."""
+
+    def __init__(self, module_name, attr):
+        self._module_name = module_name
+        self._attr = attr
+        self._value = None
+
+    def _load(self):
+        if self._value is None:
+            self._value = getattr(timed_import(self._module_name), self._attr)
+        return self._value
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+
+def lazy_import(module_name, attr=None):
+    """Return a lazy stand-in for a module, or for one name exported by it."""
+    if attr is None:
+        return LazyModule(module_name)
+    return LazyAttribute(module_name, attr)
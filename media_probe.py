@@ -0,0 +1,54 @@
+import json
+import subprocess
+
+from app_cache import file_key, load_json, save_json
+from ffmpeg_toolchain import ffprobe_path
+
+# Stream fields kept from ffprobe's output; enough to plan copies and validate outputs
+STREAM_FIELDS = ("index", "codec_type", "codec_name", "profile", "pix_fmt", "width", "height", "sample_rate", "channels", "bit_rate")
+
+
+def _probe(path):
+    command = [
+        ffprobe_path(), "-v", "error", "-of", "json",
+        "-show_entries", "format=duration,format_name,bit_rate:stream=" + ",".join(STREAM_FIELDS) + ":stream_disposition=attached_pic", path,
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    data = json.loads(result.stdout)
+    media = data.get("format", {})
+    try:
+        duration = float(media.get("duration", 0))
+    except ValueError:
+        duration = 0.0
+    streams = []
+    for stream in data.get("streams", []):
+        fields = {field: stream[field] for field in STREAM_FIELDS if field in stream}
+        # Cover art shows up as a one-frame video stream
+        fields["attached_pic"] = bool(stream.get("disposition", {}).get("attached_pic"))
+        streams.append(fields)
+    return {
+        "duration": duration,
+        "format_name": media.get("format_name", ""),
+        "bit_rate": int(media["bit_rate"]) if media.get("bit_rate", "N/A").isdigit() else None,
+        "streams": streams,
+    }
+
+
+def probe_media(path, cache=True):
+    """Return {duration, format_name, streams} for a media file via ffprobe.
+
+    Results are cached on disk keyed by path, size and mtime; pass cache=False
+    for files that are about to be replaced, such as fresh conversion outputs.
+    """
+    if not cache:
+        return _probe(path)
+    key = file_key(path)
+    media = load_json("media", key)
+    if media is None:
+        media = _probe(path)
+        save_json("media", key, media)
+    return media
+
+
+def streams_of_type(media, codec_type):
+    return [stream for stream in media["streams"] if stream.get("codec_type") == codec_type and not stream.get("attached_pic")]
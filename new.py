@@ -1,18 +1,17 @@
 import os
 import threading
-import fitz  # PyMuPDF
-import pandas as pd
-from PIL import Image
-from docx import Document
-from pdf2docx import Converter
 from tkinter import filedialog, messagebox, Tk, ttk
 from tqdm import tqdm
 
+from conversion_core import AUDIO_EXTENSIONS, CONVERTERS, VIDEO_EXTENSIONS, convert, convert_code
+from output_cache import OutputCache
+
 class FileConverter:
     def __init__(self, root):
         self.root = root
         self.selected_file = None
         self.format_var = None
+        self.output_cache = OutputCache()
         self.progress = ttk.Progressbar(root, orient='horizontal', length=300, mode='determinate')
         self.progress.pack()
     
@@ -35,99 +34,26 @@ class FileConverter:
 
     def process_conversion(self, target_format, output_file):
         self.progress['value'] = 0
-        
         ext = os.path.splitext(self.selected_file)[1].lower()
-        
-        conversion_map = {
-            ".pdf": self.convert_pdf,
-            ".docx": self.convert_docx,
-            ".txt": self.convert_txt,
-            ".jpg": self.convert_image,
-            ".png": self.convert_image,
-            ".gif": self.convert_image,
-            ".mp4": self.convert_video,
-            ".avi": self.convert_video,
-            ".mov": self.convert_video,
-            ".mkv": self.convert_video,
-            ".php": self.convert_code,
-            ".py": self.convert_code,
-            ".c": self.convert_code,
-            ".cs": self.convert_code,
-            ".vb": self.convert_code
-        }
-
-        if ext in conversion_map:
-            conversion_map[ext](target_format, output_file)
-        else:
+        if ext in VIDEO_EXTENSIONS:
+            messagebox.showerror("Error", "Video conversion not implemented!")
+            return
+        if ext in AUDIO_EXTENSIONS:
             messagebox.showerror("Error", "Unsupported file format!")
-        
-        self.progress['value'] = 100
-        messagebox.showinfo("Success", f"{target_format.upper()} saved successfully!")
-    
-    def convert_pdf(self, target_format, output_file):
-        doc = fitz.open(self.selected_file)
-        
-        if target_format == "docx":
-            cv = Converter(self.selected_file)
-            cv.convert(output_file, start=0, end=None)
-            cv.close()
-        elif target_format in ["xls", "xlsx"]:
-            text = "".join([page.get_text() for page in doc])
-            df = pd.DataFrame([text.split("\n")])
-            df.to_excel(output_file, index=False)
-        elif target_format in ["jpg", "png"]:
-            page = doc.load_page(0)
-            pix = page.get_pixmap()
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            img.save(output_file)
-        else:
-            raise ValueError("Unsupported target format for PDF!")
-    
-    def convert_docx(self, target_format, output_file):
-        doc = Document(self.selected_file)
-        
-        if target_format == "pdf":
-            doc.save(output_file)
-        elif target_format == "txt":
-            with open(output_file, "w", encoding="utf-8") as file:
-                file.write("\n".join([para.text for para in doc.paragraphs]))
-        else:
-            raise ValueError("Unsupported target format for DOCX!")
-    
-    def convert_txt(self, target_format, output_file):
-        with open(self.selected_file, "r", encoding="utf-8") as file:
-            content = file.readlines()
-        
-        if target_format == "docx":
-            doc = Document()
-            for line in content:
-                doc.add_paragraph(line.strip())
-            doc.save(output_file)
-        elif target_format in ["xls", "xlsx", "csv"]:
-            df = pd.DataFrame([content])
-            getattr(df, f"to_{target_format}")(output_file, index=False)
-        elif target_format in ["jpg", "png", "gif"]:
-            img = Image.new("RGB", (800, 600), color="white")
-            img.save(output_file)
-        else:
-            raise ValueError("Unsupported target format for TXT!")
-    
-    def convert_image(self, target_format, output_file):
-        img = Image.open(self.selected_file)
-        img.save(output_file)
-    
-    def convert_video(self, target_format, output_file):
-        messagebox.showerror("Error", "Video conversion not implemented!")
-    
-    def convert_code(self, target_format, output_file):
-        with open(self.selected_file, "r", encoding="utf-8") as file:
-            code = file.read()
-        
-        if target_format in ["php", "py", "c", "cs", "vb"]:
-            with open(output_file, "w", encoding="utf-8") as out_file:
-                out_file.write(code)
-        else:
-            raise ValueError("Unsupported target format for code!")
+            return
+        options = {}
+        if CONVERTERS.get(ext) is convert_code:
+            # This app has always saved code as is, without the "Converted to" header
+            options["header"] = False
+        try:
+            cached = convert(self.selected_file, target_format, output_file, cache=self.output_cache, **options)
+        except Exception as e:
+            messagebox.showerror("Error", f"Conversion failed: {e}")
+            return
+        finally:
+            self.progress['value'] = 100
+        status = "restored from cache" if cached else "saved successfully"
+        messagebox.showinfo("Success", f"{target_format.upper()} {status}!")
 
 if __name__ == "__main__":
     root = Tk()
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+from importlib import metadata
+
+from app_cache import cache_dir, file_key, load_json, save_json
+from ffmpeg_toolchain import probe_toolchain
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux ioctl that makes dst share src's extents (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+# Libraries whose versions decide what the document converters produce
+DOCUMENT_TOOLS = ("PyMuPDF", "pdf2docx", "pandas", "openpyxl", "python-docx", "Pillow")
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """BLAKE2 digest of a file's bytes, remembered per path, size and mtime."""
+    key = file_key(path)
+    cached = load_json("content_hash", key)
+    if cached is not None:
+        return cached["digest"]
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    save_json("content_hash", key, {"path": path, "digest": digest.hexdigest()})
+    return digest.hexdigest()
+
+
+def tool_versions(tools):
+    """Version string per tool: "ffmpeg" is the probed binary, anything else a Python distribution."""
+    versions = {}
+    for tool in tools:
+        if tool == "ffmpeg":
+            toolchain = probe_toolchain()
+            versions[tool] = toolchain["version"] if toolchain else None
+        else:
+            try:
+                versions[tool] = metadata.version(tool)
+            except metadata.PackageNotFoundError:
+                versions[tool] = None
+    return versions
+
+
+def _remove(path):
+    try:
+        os.chmod(path, stat.S_IWRITE | stat.S_IREAD)  # Windows refuses to delete read-only files
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        _remove(dst)
+        return False
+
+
+class OutputCache:
+    """Conversion outputs stored by source content, target and settings, evicted least recently used first.
+
+    Entries are read-only. Outputs are materialized as a reflink where the
+    filesystem supports it, else as a plain copy; never as a hardlink, which
+    would hand the read-only entry itself to the next write of output_file.
+    """
+
+    def __init__(self, name="outputs", max_bytes=10 * 1024 ** 3):
+        self.root = cache_dir(name)
+        self.max_bytes = max_bytes
+
+    def key(self, source, target_format, settings=None, tools=()):
+        """Cache key for converting `source` to `target_format` with the given settings and tools."""
+        recipe = {
+            "source": content_hash(source),
+            "target": target_format,
+            "settings": settings,
+            "tools": tool_versions(tools),
+        }
+        return hashlib.sha1(json.dumps(recipe, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def fetch(self, key, output_file):
+        """Materialize a cached output at output_file; returns False on a miss."""
+        entry = self._entry(key)
+        if not os.path.exists(entry):
+            return False
+        _remove(output_file)
+        if not _reflink(entry, output_file):
+            shutil.copyfile(entry, output_file)
+        os.utime(entry)  # Mark as recently used
+        return True
+
+    def store(self, key, output_file):
+        """Copy a finished output into the cache, then trim the cache to its size cap."""
+        entry = self._entry(key)
+        tmp_path = f"{entry}.{os.getpid()}.tmp"
+        if not _reflink(output_file, tmp_path):
+            shutil.copyfile(output_file, tmp_path)
+        os.chmod(tmp_path, stat.S_IREAD)
+        os.replace(tmp_path, entry)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another process meanwhile
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
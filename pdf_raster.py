@@ -0,0 +1,136 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy_imports import lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF for PDF handling
+Image = lazy_import("PIL.Image")
+TiffImagePlugin = lazy_import("PIL.TiffImagePlugin")
+
+DEFAULT_DPI = 150
+TIFF_EXTENSIONS = (".tif", ".tiff")
+# zlib level 1 encodes pages about twice as fast as Pillow's default for slightly larger files
+SAVE_OPTIONS = {".png": {"compress_level": 1}, ".jpg": {"quality": 90}, ".jpeg": {"quality": 90}}
+# Below this many pages starting worker processes costs more than it saves
+PARALLEL_MIN_PAGES = 8
+
+# The document each pool worker opened for itself; fitz documents cannot be shared
+_worker_doc = None
+
+
+def parse_page_range(spec, page_count):
+    """Turn "1-5,8,12-" (1-based, inclusive) into sorted 0-based page indices; None or "" means every page."""
+    if not spec or not str(spec).strip():
+        return list(range(page_count))
+    pages = set()
+    for part in str(spec).replace(" ", "").split(","):
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        try:
+            start = int(first) if first else 1
+            end = (int(last) if last else page_count) if dash else start
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part}")
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: {part}")
+        pages.update(range(start - 1, min(end, page_count)))
+    if not pages:
+        raise ValueError(f"No pages in range {spec}; the document has {page_count}")
+    return sorted(pages)
+
+
+def render_page(doc, index, dpi=DEFAULT_DPI):
+    """Render one page of an open fitz document to an RGB PIL image."""
+    zoom = dpi / 72  # PDF user space is 72 units per inch
+    pix = doc.load_page(index).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def series_path(output_file, index, page_count):
+    """Numbered file for page `index` of a series, e.g. scan-007.png."""
+    stem, ext = os.path.splitext(output_file)
+    return f"{stem}-{index + 1:0{len(str(page_count))}d}{ext}"
+
+
+def save_page(image, path):
+    """Write a rendered page with the per-format encoder settings."""
+    image.save(path, **SAVE_OPTIONS.get(os.path.splitext(path)[1].lower(), {}))
+
+
+def _open_worker(source):
+    global _worker_doc
+    _worker_doc = fitz.open(source)
+
+
+def _render_to_file(index, dpi, path):
+    save_page(render_page(_worker_doc, index, dpi), path)
+    return path
+
+
+def _render_to_bytes(index, dpi):
+    image = render_page(_worker_doc, index, dpi)
+    return image.size, image.tobytes()
+
+
+def _ordered(pool, fn, items, window):
+    """Map `fn` over `items` on `pool` in order, with at most `window` pages in flight."""
+    pending = deque()
+    for args in items:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def render_pdf(source, output_file, dpi=DEFAULT_DPI, pages=None, workers=None):
+    """Rasterize a PDF's pages; returns the paths written.
+
+    A .tif/.tiff output becomes one multi-page TIFF. Any other image format is
+    written as output_file for a single page, or as a numbered series next to it
+    (output-01.png, output-02.png, ...) for several. Pages are rendered by a
+    process pool whose workers each open their own copy of the document, and
+    are written out as they finish so memory does not grow with the page count.
+    """
+    with fitz.open(source) as doc:
+        page_count = doc.page_count
+        indices = parse_page_range(pages, page_count)
+        if len(indices) < PARALLEL_MIN_PAGES or workers == 1:
+            return _render_serial(doc, output_file, dpi, indices, page_count)
+
+    workers = min(workers or os.cpu_count() or 1, len(indices))
+    # A few pages per worker queued ahead keeps every core busy without buffering the document
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_worker, initargs=(source,)) as pool:
+        if os.path.splitext(output_file)[1].lower() in TIFF_EXTENSIONS:
+            rendered = _ordered(pool, _render_to_bytes, ((index, dpi) for index in indices), window)
+            images = (Image.frombytes("RGB", size, data) for size, data in rendered)
+            _write_tiff(output_file, images)
+            return [output_file]
+        paths = [output_file] if len(indices) == 1 else [series_path(output_file, index, page_count) for index in indices]
+        return list(_ordered(pool, _render_to_file, ((index, dpi, path) for index, path in zip(indices, paths)), window))
+
+
+def _render_serial(doc, output_file, dpi, indices, page_count):
+    images = (render_page(doc, index, dpi) for index in indices)
+    if os.path.splitext(output_file)[1].lower() in TIFF_EXTENSIONS:
+        _write_tiff(output_file, images)
+        return [output_file]
+    if len(indices) == 1:
+        save_page(next(images), output_file)
+        return [output_file]
+    paths = []
+    for index, image in zip(indices, images):
+        paths.append(series_path(output_file, index, page_count))
+        save_page(image, paths[-1])
+    return paths
+
+
+def _write_tiff(output_file, images):
+    """Append pages to a multi-page TIFF one at a time instead of holding them all."""
+    with TiffImagePlugin.AppendingTiffWriter(output_file, True) as tiff:
+        for image in images:
+            image.save(tiff, format="TIFF", compression="tiff_deflate")
+            tiff.newFrame()
@@ -0,0 +1,148 @@
+import csv
+import os
+
+from lazy_imports import lazy_import
+from pdf_raster import parse_page_range
+
+fitz = lazy_import("fitz")  # PyMuPDF for PDF handling
+openpyxl = lazy_import("openpyxl")
+openpyxl_cell = lazy_import("openpyxl.cell.cell")
+
+TEXT_HEADER = ("page", "line", "text")
+TABLE_HEADER = ("page", "table", "row")
+# Excel's hard limits; longer sheets continue on "Text 2", "Text 3", ...
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_CELL = 32767
+# MuPDF keeps every object it has parsed until the document is closed, so
+# long documents are reopened every so many pages to keep memory flat
+REOPEN_PAGES = 500
+
+
+def iter_pages(source, indices):
+    """Yield (index, page) for the given page indices of a PDF."""
+    doc = None
+    try:
+        for count, index in enumerate(indices):
+            if count % REOPEN_PAGES == 0:
+                if doc is not None:
+                    doc.close()
+                doc = fitz.open(source)
+            yield index, doc.load_page(index)
+    finally:
+        if doc is not None:
+            doc.close()
+
+
+def iter_text_lines(source, indices):
+    """Yield (page, line, text) for every non-empty line, 1-based, one page in memory at a time."""
+    for index, page in iter_pages(source, indices):
+        text = page.get_text("text")
+        number = 0
+        for line in text.splitlines():
+            line = line.strip()
+            if line:
+                number += 1
+                yield index + 1, number, line
+
+
+def iter_table_rows(source, indices):
+    """Yield (page, table, row, cells) for tables PyMuPDF detects from ruling lines and text alignment."""
+    for index, page in iter_pages(source, indices):
+        for table_number, table in enumerate(page.find_tables().tables, 1):
+            for row_number, cells in enumerate(table.extract(), 1):
+                yield index + 1, table_number, row_number, ["" if cell is None else cell for cell in cells]
+
+
+class CSVSink:
+    """Rows straight to a CSV file."""
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+
+    def sheet(self, title, header):
+        self.writer.writerow(header)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class XLSXSink:
+    """Rows to a write-only openpyxl workbook, which streams them to disk instead of keeping cells."""
+
+    def __init__(self, path):
+        self.path = path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.worksheet = None
+
+    def sheet(self, title, header):
+        self.title = title
+        self.header = header
+        self.sheets = 1
+        self._new_sheet(title)
+
+    def _new_sheet(self, title):
+        self.worksheet = self.workbook.create_sheet(title)
+        self.worksheet.append(self.header)
+        self.rows = 1
+
+    def write(self, row):
+        if self.rows >= EXCEL_MAX_ROWS:
+            self.sheets += 1
+            self._new_sheet(f"{self.title} {self.sheets}")
+        self.worksheet.append([self._cell(value) for value in row])
+        self.rows += 1
+
+    @staticmethod
+    def _cell(value):
+        if not isinstance(value, str):
+            return value
+        # Control characters are invalid in the XML and make openpyxl refuse the row
+        return openpyxl_cell.ILLEGAL_CHARACTERS_RE.sub("", value)[:EXCEL_MAX_CELL]
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+def tables_file(output_file):
+    """Where a CSV extraction's tables go: a "-tables.csv" file next to the output."""
+    return os.path.splitext(output_file)[0] + "-tables.csv"
+
+
+def extract_pdf_text(source, output_file, target_format, pages=None, tables=False):
+    """Write a PDF's text as one row per line (page, line, text) as "csv" or "xlsx"; returns the rows written.
+
+    With tables=True the detected tables go to a "Tables" sheet, or for CSV to
+    tables_file(output_file), one row per table row. Pages are read and written
+    one at a time, so memory stays flat however long the document is.
+    """
+    if target_format not in ("csv", "xlsx"):
+        # openpyxl only writes xlsx; saving that under .xls would make a file Excel rejects
+        raise ValueError(f"Cannot write PDF text as {target_format}; use csv or xlsx")
+    is_csv = target_format == "csv"
+    sink = CSVSink(output_file) if is_csv else XLSXSink(output_file)
+    count = 0
+    try:
+        with fitz.open(source) as doc:
+            indices = parse_page_range(pages, doc.page_count)
+        sink.sheet("Text", TEXT_HEADER)
+        for record in iter_text_lines(source, indices):
+            sink.write(record)
+            count += 1
+        if tables:
+            table_sink = sink
+            if is_csv:
+                table_sink = CSVSink(tables_file(output_file))
+            try:
+                table_sink.sheet("Tables", TABLE_HEADER)
+                for page, table, row, cells in iter_table_rows(source, indices):
+                    table_sink.write([page, table, row, *cells])
+            finally:
+                if table_sink is not sink:
+                    table_sink.close()
+    finally:
+        sink.close()
+    return count
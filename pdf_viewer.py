@@ -0,0 +1,87 @@
+import queue
+import threading
+from collections import OrderedDict
+
+from lazy_imports import lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF for PDF handling
+Image = lazy_import("PIL.Image")
+
+# Pages rendered ahead of and behind the current one
+PREFETCH_AHEAD = 2
+PREFETCH_BEHIND = 1
+
+
+class PDFPageCache:
+    """Pages of one PDF rendered to fit a box, kept in a small LRU and prefetched around the current page.
+
+    The document is opened once and stays open. fitz documents are not
+    thread-safe, so the UI thread and the prefetch thread take turns with a lock.
+    """
+
+    def __init__(self, path, capacity=12):
+        self.path = path
+        self.capacity = capacity
+        self.doc = fitz.open(path)
+        self.page_count = self.doc.page_count
+        self.pages = OrderedDict()  # (index, width, height) -> PIL image
+        self._lock = threading.Lock()
+        self._wanted = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+        self._thread.start()
+
+    def get(self, index, size):
+        """Page `index` scaled to fit `size` (width, height), then prefetch its neighbours."""
+        image = self._render(index, size)
+        self._prefetch(index, size)
+        return image
+
+    def close(self):
+        self._wanted.put(None)
+        with self._lock:
+            self._closed = True
+            self.pages.clear()
+            self.doc.close()
+
+    def _render(self, index, size):
+        key = (index, size[0], size[1])
+        with self._lock:
+            if self._closed:
+                return None
+            image = self.pages.get(key)
+            if image is not None:
+                self.pages.move_to_end(key)
+                return image
+            page = self.doc.load_page(index)
+            # Straight to the target resolution, keeping the aspect ratio, instead of a full render and a resize
+            zoom = min(size[0] / page.rect.width, size[1] / page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            self.pages[key] = image
+            while len(self.pages) > self.capacity:
+                self.pages.popitem(last=False)
+            return image
+
+    def _prefetch(self, index, size):
+        # Only the latest request matters; drop neighbours of pages already flipped past
+        while not self._wanted.empty():
+            try:
+                self._wanted.get_nowait()
+            except queue.Empty:
+                break
+        neighbours = [index + step for step in range(1, PREFETCH_AHEAD + 1)]
+        neighbours += [index - step for step in range(1, PREFETCH_BEHIND + 1)]
+        for neighbour in neighbours:
+            if 0 <= neighbour < self.page_count:
+                self._wanted.put((neighbour, size))
+
+    def _prefetch_loop(self):
+        while True:
+            wanted = self._wanted.get()
+            if wanted is None or self._closed:
+                return
+            try:
+                self._render(*wanted)
+            except (RuntimeError, ValueError) as e:  # Damaged page
+                print(f"PDF prefetch failed for {self.path}: {e}")
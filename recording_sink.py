@@ -0,0 +1,375 @@
+"""Encoders for screen recordings, decoupled from the capture thread.
+
+    sink = open_sink("out.mp4", (1920, 1080), fps=30, crf=22)
+    sink.write(frame)     # BGRA frame; never blocks, returns False if dropped
+    sink.duplicate(2)     # show the last frame for two more frame intervals
+    sink.close()          # flush and finish the file
+
+    replay = open_sink(None, (1920, 1080), fps=30, replay_seconds=30)
+    replay.dump("incident.mp4")   # the last ~30 s, while recording carries on
+
+Frames are copied into a fixed pool of buffers and handed to a writer thread,
+which converts each one to the encoder's pixel format. When encoding falls
+behind and the pool runs dry, frames are dropped and counted rather than
+stalling capture; the pool size bounds memory use. Output is constant frame
+rate: the caller keeps it in step with the clock by duplicating the previous
+frame over gaps and while the screen is unchanged, which re-sends the already
+converted frame without copying or converting anything.
+"""
+import abc
+import csv
+import math
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from ffmpeg_toolchain import ffmpeg_available, ffmpeg_path, ffmpeg_version, video_codec_args
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+DEFAULT_CODEC = "h264"
+DEFAULT_CRF = 22
+# Fast enough for 1080p at 30 fps on a few cores; slower presets shrink files a little more
+DEFAULT_PRESET = "veryfast"
+# Memory for queued frames: about a second of 1080p BGRA
+QUEUE_BYTES = 256 * 1024 * 1024
+MIN_QUEUE_FRAMES = 4
+# Drops frames identical to the last one kept; with variable frame rate output the kept frame's duration covers them.
+# max limits how many repeats in a row are dropped (0: no limit).
+DECIMATE = "mpdecimate=hi=0:lo=0:frac=0:max={max}"
+DEFAULT_REPLAY_SECONDS = 30
+REPLAY_SEGMENT_SECONDS = 2
+# Save dialog choices for replay clips; the H.264/HEVC stream is copied into any of them
+REPLAY_FILETYPES = [("MP4 video", "*.mp4"), ("Matroska video", "*.mkv"), ("QuickTime movie", "*.mov"), ("MPEG-TS", "*.ts")]
+SEGMENT_NAME = re.compile(r"ring_(\d+)\.ts$")
+
+
+class RecordingError(Exception):
+    """The encoder could not start or stopped while recording."""
+
+
+class _PooledSink(abc.ABC):
+    """Buffer pool plus writer thread; subclasses convert and encode one buffer at a time."""
+
+    def __init__(self, size, queue_bytes=QUEUE_BYTES):
+        width, height = size
+        self.size = size
+        self.written = 0
+        self.duplicated = 0
+        self.convert_seconds = 0.0
+        self.dropped = 0
+        self.error = None
+        self._free = queue.Queue()
+        self._filled = queue.Queue()
+        for _ in range(max(MIN_QUEUE_FRAMES, queue_bytes // (width * height * 4))):
+            self._free.put(np.empty((height, width, 4), np.uint8))
+        self._thread = threading.Thread(target=self._feed, daemon=True)
+
+    def write(self, frame):
+        """Queue a copy of a BGRA frame; returns False if it was dropped because the encoder is behind."""
+        if self.error:
+            raise self.error
+        try:
+            buffer = self._free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        np.copyto(buffer, frame)
+        self._filled.put(buffer)
+        return True
+
+    def duplicate(self, count=1):
+        """Repeat the last written frame `count` more times; never blocks or drops."""
+        if self.error:
+            raise self.error
+        if count > 0:
+            self._filled.put(count)
+
+    def close(self):
+        """Encode everything still queued and finish the file; raises RecordingError on failure."""
+        self._filled.put(None)
+        self._thread.join()
+        self._finish()
+        if self.error:
+            raise self.error
+
+    def _feed(self):
+        converted = None  # The last frame in the encoder's format, re-sent by duplicate()
+        while True:
+            item = self._filled.get()
+            if item is None:
+                return
+            if self.error is not None:
+                if not isinstance(item, int):
+                    self._free.put(item)
+                continue
+            try:
+                if isinstance(item, int):
+                    if converted is not None:
+                        self._repeat(converted, item)
+                        self.duplicated += item
+                    continue
+                before = time.monotonic()
+                converted = self._convert(item)
+                self.convert_seconds += time.monotonic() - before
+                self._free.put(item)
+                self._encode(converted)
+                self.written += 1
+            except Exception as e:
+                self.error = e if isinstance(e, RecordingError) else RecordingError(str(e))
+
+    @abc.abstractmethod
+    def _convert(self, buffer):
+        """The frame in the encoder's input format; may reuse one output array, as only the latest is kept."""
+
+    @abc.abstractmethod
+    def _encode(self, converted):
+        """Hand one converted frame to the encoder."""
+
+    def _repeat(self, converted, count):
+        for _ in range(count):
+            self._encode(converted)
+
+    def _finish(self):
+        pass
+
+
+def _vfr_args():
+    """Variable frame rate output, which mpdecimate needs; -fps_mode replaced -vsync in FFmpeg 5.1."""
+    version = ffmpeg_version()
+    # Git snapshots report no release number; anything current has -fps_mode
+    if version is not None and version < (5, 1):
+        return ["-vsync", "vfr"]
+    return ["-fps_mode", "vfr"]
+
+
+class FFmpegSink(_PooledSink):
+    """Pipes raw frames into an ffmpeg process encoding x264/x265.
+
+    Frames are converted to yuv420p here with OpenCV (BT.601, limited range,
+    the same as FFmpeg's own default), which is 2.7x less data through the
+    pipe than BGRA and spares FFmpeg the conversion. Repeated frames still go
+    through the pipe to keep the rawvideo timeline, but mpdecimate drops exact
+    repeats before the encoder and the file is written with variable frame
+    rate, so a static screen costs next to nothing to encode.
+    """
+
+    def __init__(self, output_file, size, fps, codec=DEFAULT_CODEC, crf=DEFAULT_CRF, preset=DEFAULT_PRESET, queue_bytes=QUEUE_BYTES):
+        super().__init__(size, queue_bytes)
+        # yuv420p needs even dimensions; drop the odd row/column instead of failing
+        self.width, self.height = size[0] & ~1, size[1] & ~1
+        self._yuv = None
+        self._repeat_pending = False
+        target_format = os.path.splitext(output_file)[1].lstrip(".").lower()
+        self.codec_args = video_codec_args(target_format, crf, preset, family=codec)
+        command = [
+            ffmpeg_path(), "-hide_banner", "-v", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "yuv420p", "-s", f"{self.width}x{self.height}", "-framerate", str(fps), "-i", "-",
+            "-vf", self._video_filter(fps), *_vfr_args(), *self.codec_args,
+            *self._output_args(output_file, target_format),
+        ]
+        self.command = command
+        self.log = []
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise RecordingError(f"Cannot start FFmpeg: {e}")
+        self._log_thread = threading.Thread(target=self._read_log, daemon=True)
+        self._log_thread.start()
+        self._thread.start()
+
+    @property
+    def encoder(self):
+        return self.codec_args[1] if len(self.codec_args) > 1 else "ffmpeg"
+
+    def _video_filter(self, fps):
+        return DECIMATE.format(max=0)
+
+    def _output_args(self, output_file, target_format):
+        if target_format in ("mp4", "mov"):
+            return ["-movflags", "+faststart", output_file]
+        return [output_file]
+
+    def _convert(self, buffer):
+        self._flush_repeat()
+        self._yuv = cv2.cvtColor(buffer[:self.height, :self.width], cv2.COLOR_BGRA2YUV_I420, dst=self._yuv)
+        return self._yuv
+
+    def _repeat(self, converted, count):
+        # The last repeat of a run is held back in case the recording ends on it; see _finish
+        self._flush_repeat()
+        for _ in range(count - 1):
+            self._encode(converted)
+        self._repeat_pending = True
+
+    def _flush_repeat(self):
+        if self._repeat_pending:
+            self._repeat_pending = False
+            self._encode(self._yuv)
+
+    def _encode(self, converted):
+        try:
+            self.process.stdin.write(converted.data)
+        except OSError:
+            # FFmpeg quit; its own message is more useful than the broken pipe
+            self.process.wait()
+            raise RecordingError(self._failure())
+
+    def _finish(self):
+        if self._repeat_pending and self.error is None:
+            # mpdecimate would drop a trailing run of repeats and the file would end at the
+            # last change; one luma level off mid-frame (mpdecimate skips the left edge) keeps it
+            self._repeat_pending = False
+            self._yuv[self.height // 2, self.width // 2] ^= 1
+            try:
+                self._encode(self._yuv)
+            except RecordingError as e:
+                self.error = e
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        returncode = self.process.wait()
+        self._log_thread.join()
+        if returncode and self.error is None:
+            self.error = RecordingError(self._failure())
+
+    def _failure(self):
+        self._log_thread.join(timeout=1)
+        return self.log[-1].strip() if self.log else f"FFmpeg exited with code {self.process.returncode}"
+
+    def _read_log(self):
+        """Keep the stderr tail for error reports; also stops FFmpeg blocking on a full pipe."""
+        for line in self.process.stderr:
+            self.log.append(line.decode("utf-8", "replace"))
+            del self.log[:-50]
+
+
+class ReplaySink(FFmpegSink):
+    """FFmpegSink that keeps only the last few seconds, as a ring of MPEG-TS segments.
+
+    FFmpeg's segment muxer cuts a segment every REPLAY_SEGMENT_SECONDS on a
+    forced keyframe and wraps its file numbering, so the ring never holds more
+    than `segments` + 2 files: the ones kept, the one being written and the
+    next to be overwritten. The ring lives on tmpfs (/dev/shm) where there is
+    one. dump() remuxes the ring into a single file without re-encoding.
+    """
+
+    def __init__(self, size, fps, seconds=DEFAULT_REPLAY_SECONDS, codec=DEFAULT_CODEC, crf=DEFAULT_CRF, preset=DEFAULT_PRESET,
+                 segment_seconds=REPLAY_SEGMENT_SECONDS, queue_bytes=QUEUE_BYTES):
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+        self.segments = max(1, math.ceil(seconds / segment_seconds))
+        shm = "/dev/shm"
+        self.directory = tempfile.mkdtemp(prefix="player-replay-", dir=shm if os.access(shm, os.W_OK) else None)
+        try:
+            self.list_file = os.path.join(self.directory, "ring.csv")
+            super().__init__(os.path.join(self.directory, "ring_%03d.ts"), size, fps, codec, crf, preset, queue_bytes)
+        except Exception:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            raise
+
+    def _video_filter(self, fps):
+        # Keep a frame at least every second, so segments still get cut while the screen is static
+        return DECIMATE.format(max=fps)
+
+    def _output_args(self, output_file, target_format):
+        return [
+            "-force_key_frames", f"expr:gte(t,n_forced*{self.segment_seconds})",
+            # reset_timestamps 0: the segments continue one timeline, so they can be joined byte for byte
+            "-f", "segment", "-segment_format", "mpegts", "-segment_time", str(self.segment_seconds),
+            "-segment_wrap", str(self.segments + 2), "-reset_timestamps", "0",
+            # The list names the finished segments in order; the one after the last is being written
+            "-segment_list", self.list_file, "-segment_list_type", "csv", "-segment_list_size", str(self.segments),
+            # Write each packet out at once, so a dump includes the segment in progress up to now
+            "-segment_format_options", "flush_packets=1", output_file,
+        ]
+
+    def ring(self):
+        """Segment files to dump, oldest first: the newest `segments` finished ones plus the one in progress."""
+        names = []
+        for _ in range(3):
+            try:
+                with open(self.list_file, newline="") as f:
+                    names = [row[0] for row in csv.reader(f) if len(row) >= 3]
+            except FileNotFoundError:
+                break  # Still in the first segment
+            if names:
+                break
+            time.sleep(0.02)  # Caught FFmpeg rewriting the list
+        current = (int(SEGMENT_NAME.match(names[-1]).group(1)) + 1) % (self.segments + 2) if names else 0
+        names.append(f"ring_{current:03d}.ts")
+        paths = [os.path.join(self.directory, name) for name in names]
+        return [path for path in paths if os.path.exists(path)]
+
+    def dump(self, output_file):
+        """Write the buffered seconds to output_file, in the container its extension names."""
+        paths = self.ring()
+        if not paths:
+            raise RecordingError("The replay buffer is still empty")
+        # The segment being written ends mid-packet; FFmpeg reports that but copies everything before it
+        return remux("concat:" + "|".join(paths), output_file)
+
+    def _finish(self):
+        try:
+            super()._finish()
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class OpenCVSink(_PooledSink):
+    """cv2.VideoWriter with MPEG-4 Part 2; only used when FFmpeg is missing."""
+
+    encoder = "opencv mp4v"
+
+    def __init__(self, output_file, size, fps, queue_bytes=QUEUE_BYTES):
+        super().__init__(size, queue_bytes)
+        self._bgr = None
+        self.writer = cv2.VideoWriter(output_file, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+        if not self.writer.isOpened():
+            raise RecordingError(f"OpenCV cannot write {output_file}")
+        self._thread.start()
+
+    def _convert(self, buffer):
+        self._bgr = cv2.cvtColor(buffer, cv2.COLOR_BGRA2BGR, dst=self._bgr)
+        return self._bgr
+
+    def _encode(self, converted):
+        self.writer.write(converted)
+
+    def _finish(self):
+        self.writer.release()
+
+
+def remux(source, output_file):
+    """Stream-copy a recording into the container output_file's extension names (mp4, mkv, mov, ts, ...)."""
+    command = [ffmpeg_path(), "-hide_banner", "-v", "error", "-y", "-i", source, "-c", "copy"]
+    if os.path.splitext(output_file)[1].lower() in (".mp4", ".mov"):
+        command += ["-movflags", "+faststart"]
+    command.append(output_file)
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode or not os.path.exists(output_file):
+        raise RecordingError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"FFmpeg exited with code {result.returncode}")
+    return output_file
+
+
+def open_sink(output_file, size, fps, codec=DEFAULT_CODEC, crf=DEFAULT_CRF, preset=DEFAULT_PRESET, replay_seconds=None):
+    """FFmpegSink when FFmpeg is available, otherwise the OpenCV fallback.
+
+    With replay_seconds, a ReplaySink keeping that many seconds instead; output_file is unused.
+    """
+    if replay_seconds:
+        if not ffmpeg_available():
+            raise RecordingError("The replay buffer needs FFmpeg")
+        return ReplaySink(size, fps, replay_seconds, codec, crf, preset)
+    if ffmpeg_available():
+        return FFmpegSink(output_file, size, fps, codec, crf, preset)
+    print("FFmpeg not found; recording with OpenCV's MPEG-4 encoder")
+    return OpenCVSink(output_file, size, fps)
@@ -0,0 +1,319 @@
+"""Screen capture backends that all return frames as BGRA NumPy arrays.
+
+    capture = open_capture()          # fastest available: xshm, then mss, then pil
+    frame = capture.grab()            # (height, width, 4) uint8, BGRA
+    capture.close()
+
+Frames from xshm and mss are views onto the backend's own buffer, valid until
+the next grab(); copy them if they must outlive that. Set PLAYER_CAPTURE_BACKEND
+to force a backend.
+"""
+import contextlib
+import ctypes
+import ctypes.util
+import os
+import sys
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+mss = lazy_import("mss")
+ImageGrab = lazy_import("PIL.ImageGrab")
+
+# X11 / System V constants
+ZPIXMAP = 2
+ALL_PLANES = 0xFFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class CaptureError(Exception):
+    """A capture backend that cannot run here, e.g. no X display or a missing module."""
+
+
+class _XImage(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+        ("obdata", ctypes.c_void_p),
+        ("funcs", ctypes.c_void_p * 6),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("resourceid", ctypes.c_ulong),
+        ("serial", ctypes.c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+
+_X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+
+def _load_library(name):
+    path = ctypes.util.find_library(name)
+    if path is None:
+        raise CaptureError(f"lib{name} not found")
+    return ctypes.CDLL(path)
+
+
+def _bind(lib, name, restype, *argtypes):
+    function = getattr(lib, name)
+    function.restype = restype
+    function.argtypes = argtypes
+    return function
+
+
+class XShmCapture:
+    """X11 MIT-SHM grabber: the X server copies pixels straight into shared memory that NumPy views.
+
+    Only needs libX11 and libXext through ctypes. One instance belongs to one
+    thread; create it on the thread that grabs.
+    """
+
+    name = "xshm"
+
+    def __init__(self, region=None, display=None):
+        if sys.platform != "linux":
+            raise CaptureError("XShm capture needs X11")
+        display_name = display or os.environ.get("DISPLAY")
+        if not display_name:
+            raise CaptureError("DISPLAY is not set")
+        x11 = _load_library("X11")
+        xext = _load_library("Xext")
+        libc = ctypes.CDLL(None, use_errno=True)
+        vp, c_int, c_uint = ctypes.c_void_p, ctypes.c_int, ctypes.c_uint
+        self._XOpenDisplay = _bind(x11, "XOpenDisplay", vp, ctypes.c_char_p)
+        self._XCloseDisplay = _bind(x11, "XCloseDisplay", c_int, vp)
+        self._XDefaultScreen = _bind(x11, "XDefaultScreen", c_int, vp)
+        self._XRootWindow = _bind(x11, "XRootWindow", ctypes.c_ulong, vp, c_int)
+        self._XDefaultVisual = _bind(x11, "XDefaultVisual", vp, vp, c_int)
+        self._XDefaultDepth = _bind(x11, "XDefaultDepth", c_int, vp, c_int)
+        self._XDisplayWidth = _bind(x11, "XDisplayWidth", c_int, vp, c_int)
+        self._XDisplayHeight = _bind(x11, "XDisplayHeight", c_int, vp, c_int)
+        self._XSync = _bind(x11, "XSync", c_int, vp, c_int)
+        self._XFree = _bind(x11, "XFree", c_int, vp)
+        self._XSetErrorHandler = _bind(x11, "XSetErrorHandler", vp, vp)
+        self._XShmQueryExtension = _bind(xext, "XShmQueryExtension", c_int, vp)
+        self._XShmCreateImage = _bind(xext, "XShmCreateImage", ctypes.POINTER(_XImage), vp, vp, c_uint, c_int, vp, ctypes.POINTER(_XShmSegmentInfo), c_uint, c_uint)
+        self._XShmAttach = _bind(xext, "XShmAttach", c_int, vp, ctypes.POINTER(_XShmSegmentInfo))
+        self._XShmDetach = _bind(xext, "XShmDetach", c_int, vp, ctypes.POINTER(_XShmSegmentInfo))
+        self._XShmGetImage = _bind(xext, "XShmGetImage", c_int, vp, ctypes.c_ulong, ctypes.POINTER(_XImage), c_int, c_int, ctypes.c_ulong)
+        self._shmget = _bind(libc, "shmget", c_int, c_int, ctypes.c_size_t, c_int)
+        self._shmat = _bind(libc, "shmat", vp, c_int, vp, c_int)
+        self._shmdt = _bind(libc, "shmdt", c_int, vp)
+        self._shmctl = _bind(libc, "shmctl", c_int, c_int, c_int, vp)
+
+        # Xlib's default error handler exits the process, so requests that can fail run
+        # under _trap_errors(); the handler is process-wide and shared with Tk
+        self._errors = []
+        self._previous_handler = None
+        self._error_handler = _X_ERROR_HANDLER(self._on_x_error)  # Must outlive every install
+
+        self.display = self._XOpenDisplay(display_name.encode())
+        if not self.display:
+            raise CaptureError(f"Cannot open display {display_name}")
+        self.image = None
+        self.segment = _XShmSegmentInfo(shmid=-1)
+        try:
+            if not self._XShmQueryExtension(self.display):
+                raise CaptureError("X server has no MIT-SHM extension")
+            screen = self._XDefaultScreen(self.display)
+            self.root = self._XRootWindow(self.display, screen)
+            screen_size = (self._XDisplayWidth(self.display, screen), self._XDisplayHeight(self.display, screen))
+            self.left, self.top, width, height = region or (0, 0, *screen_size)
+            # Grabbing outside the root window is a BadMatch error
+            width = min(width, screen_size[0] - self.left)
+            height = min(height, screen_size[1] - self.top)
+            if width <= 0 or height <= 0 or self.left < 0 or self.top < 0:
+                raise CaptureError(f"Region {region} is outside the {screen_size[0]}x{screen_size[1]} screen")
+            self.size = (width, height)
+            self.image = self._XShmCreateImage(
+                self.display, self._XDefaultVisual(self.display, screen), self._XDefaultDepth(self.display, screen),
+                ZPIXMAP, None, ctypes.byref(self.segment), width, height,
+            )
+            if not self.image:
+                raise CaptureError("XShmCreateImage failed")
+            image = self.image.contents
+            if image.bits_per_pixel != 32:
+                raise CaptureError(f"Unsupported {image.bits_per_pixel} bits per pixel; need a 24/32-bit display")
+            length = image.bytes_per_line * height
+            self.segment.shmid = self._shmget(IPC_PRIVATE, length, IPC_CREAT | 0o600)
+            if self.segment.shmid < 0:
+                raise CaptureError(f"shmget failed: {os.strerror(ctypes.get_errno())}")
+            address = self._shmat(self.segment.shmid, None, 0)
+            if address in (None, ctypes.c_void_p(-1).value):
+                raise CaptureError(f"shmat failed: {os.strerror(ctypes.get_errno())}")
+            self.segment.shmaddr = image.data = address
+            self.segment.readOnly = 0
+            with self._trap_errors() as errors:
+                attached = self._XShmAttach(self.display, ctypes.byref(self.segment))
+                self._XSync(self.display, 0)
+            if not attached:
+                raise CaptureError("XShmAttach failed")
+            if errors:
+                # Typically a remote display, which cannot see this machine's shared memory
+                raise CaptureError("X server refused the shared memory segment")
+            # Marked for removal now, so the segment goes away with the process even after a crash
+            self._shmctl(self.segment.shmid, IPC_RMID, None)
+            buffer = (ctypes.c_ubyte * length).from_address(address)
+            # Little-endian 32-bit pixels are B, G, R, X in memory
+            self.frame = np.ndarray((height, width, 4), np.uint8, buffer, strides=(image.bytes_per_line, 4, 1))
+        except Exception:
+            self.close()
+            raise
+
+    def _on_x_error(self, display, event):
+        if display != self.display:
+            # Another connection's error, e.g. Tk's: hand it to whoever handled it before
+            if self._previous_handler:
+                return _X_ERROR_HANDLER(self._previous_handler)(display, event)
+            return 0
+        # The event is only valid during this call
+        self._errors.append(event.contents.error_code)
+        return 0
+
+    @contextlib.contextmanager
+    def _trap_errors(self):
+        """Collect this display's X errors into the yielded list for the duration of the block."""
+        del self._errors[:]
+        self._previous_handler = self._XSetErrorHandler(ctypes.cast(self._error_handler, ctypes.c_void_p))
+        try:
+            yield self._errors
+        finally:
+            self._XSetErrorHandler(self._previous_handler)
+            self._previous_handler = None
+
+    def grab(self):
+        """Copy the current screen into shared memory and return the BGRA view of it."""
+        # XShmGetImage waits for the reply, so any error has arrived by the time it returns
+        with self._trap_errors() as errors:
+            grabbed = self._XShmGetImage(self.display, self.root, self.image, self.left, self.top, ALL_PLANES)
+        if not grabbed or errors:
+            raise CaptureError(f"XShmGetImage failed (X error {errors[0]})" if errors else "XShmGetImage failed")
+        return self.frame
+
+    def close(self):
+        if self.display is None:
+            return
+        if self.segment.shmaddr:
+            with self._trap_errors():
+                self._XShmDetach(self.display, ctypes.byref(self.segment))
+                self._XSync(self.display, 0)
+            self._shmdt(self.segment.shmaddr)
+            self.segment.shmaddr = None
+        if self.segment.shmid >= 0:
+            self._shmctl(self.segment.shmid, IPC_RMID, None)  # Already gone unless setup failed midway
+            self.segment.shmid = -1
+        if self.image:
+            self.image.contents.data = None
+            self._XFree(self.image)
+            self.image = None
+        self._XCloseDisplay(self.display)
+        self.display = None
+
+
+class MSSCapture:
+    """The mss package (X11, Windows, macOS); frames are views onto its BGRA buffer."""
+
+    name = "mss"
+
+    def __init__(self, region=None, display=None):
+        try:
+            self.sct = mss.mss()
+        except ImportError:
+            raise CaptureError("mss is not installed")
+        except Exception as e:
+            raise CaptureError(f"mss cannot capture here: {e}")
+        if region:
+            left, top, width, height = region
+        else:
+            monitor = self.sct.monitors[1]  # monitors[0] is the union of all screens
+            left, top, width, height = monitor["left"], monitor["top"], monitor["width"], monitor["height"]
+        self.monitor = {"left": left, "top": top, "width": width, "height": height}
+        self.size = (width, height)
+
+    def grab(self):
+        shot = self.sct.grab(self.monitor)
+        return np.frombuffer(shot.raw, np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self):
+        self.sct.close()
+
+
+class PILCapture:
+    """Pillow's ImageGrab, available on every platform but copying and converting each frame."""
+
+    name = "pil"
+
+    def __init__(self, region=None, display=None):
+        self.bbox = None
+        if region:
+            left, top, width, height = region
+            self.bbox = (left, top, left + width, top + height)
+        try:
+            first = ImageGrab.grab(bbox=self.bbox)
+        except (ImportError, OSError) as e:
+            raise CaptureError(f"ImageGrab cannot capture here: {e}")
+        self.size = first.size
+        self.frame = np.full((self.size[1], self.size[0], 4), 255, np.uint8)
+
+    def grab(self):
+        rgb = np.asarray(ImageGrab.grab(bbox=self.bbox).convert("RGB"))
+        self.frame[..., 0] = rgb[..., 2]
+        self.frame[..., 1] = rgb[..., 1]
+        self.frame[..., 2] = rgb[..., 0]
+        return self.frame
+
+    def close(self):
+        pass
+
+
+BACKENDS = {backend.name: backend for backend in (XShmCapture, MSSCapture, PILCapture)}
+
+
+def open_capture(backend=None, region=None):
+    """Open the requested backend, or the fastest one that works here.
+
+    region is (left, top, width, height); the whole primary screen by default.
+    """
+    backend = backend or os.environ.get("PLAYER_CAPTURE_BACKEND")
+    if backend:
+        if backend not in BACKENDS:
+            raise CaptureError(f"Unknown capture backend {backend}; choose from {', '.join(BACKENDS)}")
+        return BACKENDS[backend](region)
+    errors = []
+    for candidate in BACKENDS.values():
+        try:
+            return candidate(region)
+        except CaptureError as e:
+            errors.append(f"{candidate.name}: {e}")
+    raise CaptureError("No screen capture backend works here (" + "; ".join(errors) + ")")
@@ -0,0 +1,264 @@
+import threading
+import time
+
+from lazy_imports import lazy_import
+from recording_sink import DEFAULT_CODEC, DEFAULT_CRF, DEFAULT_PRESET, RecordingError, open_sink
+from screen_capture import open_capture
+
+np = lazy_import("numpy")
+
+DEFAULT_FPS = 30
+# CRF for the apps' recording quality menu; "4K" and "8K" mean best quality, not a resize
+QUALITY_CRF = {"Low": 32, "Medium": 27, "High": 22, "4K": 18, "8K": 18}
+# Change detection compares every Nth pixel row in full: anything taller than N
+# pixels is caught (text, windows, video) for 1/N of the memory traffic
+DIFF_ROW_STEP = 4
+
+
+class ChangeDetector:
+    """Tells whether a BGRA frame differs from the last one it was shown."""
+
+    def __init__(self, row_step=DIFF_ROW_STEP):
+        self.row_step = row_step
+        self.previous = None
+        self.seconds = 0.0
+
+    def changed(self, frame):
+        before = time.monotonic()
+        # One uint32 per pixel: a quarter of the elements to compare
+        sample = frame[::self.row_step].view(np.uint32)
+        unchanged = self.previous is not None and self.previous.shape == sample.shape and np.array_equal(sample, self.previous)
+        if not unchanged:
+            if self.previous is None or self.previous.shape != sample.shape:
+                self.previous = sample.copy()
+            else:
+                np.copyto(self.previous, sample)
+        self.seconds += time.monotonic() - before
+        return not unchanged
+
+    def reset(self):
+        """Forget the last frame, e.g. when it never reached the encoder."""
+        self.previous = None
+
+
+class MediaClock:
+    """Monotonic clock for the recording's timeline; it stands still while paused."""
+
+    def __init__(self):
+        self.origin = None
+        self.paused_at = None
+        self.paused_total = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def start(self, now=None):
+        self.origin = time.monotonic() if now is None else now
+
+    def pause(self):
+        with self._lock:
+            if self.paused_at is None:
+                self.paused_at = time.monotonic()
+
+    def resume(self):
+        with self._lock:
+            if self.paused_at is not None:
+                self.paused_total += time.monotonic() - self.paused_at
+                self.paused_at = None
+
+    def media_time(self, now=None):
+        """Seconds of recording at monotonic time `now`, not counting pauses."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.paused_at is not None:
+                now = min(now, self.paused_at)
+            return max(0.0, now - self.origin - self.paused_total)
+
+
+class RecordingStats:
+    """Counters for one recording session."""
+
+    def __init__(self):
+        self.frames = 0  # Frames captured
+        self.late_frames = 0  # Ticks where capture took longer than a frame interval
+        self.dropped_frames = 0  # Captured but discarded because the encoder was behind
+        self.skipped_frames = 0  # Captured twice within one output frame interval
+        self.unchanged_frames = 0  # Identical to the previous frame; sent as a duplicate marker
+        self.duplicated_frames = 0  # Output frames repeated: gaps in capture plus unchanged frames
+        self.capture_seconds = 0.0
+        self.detect_seconds = 0.0
+        self.convert_seconds = 0.0
+        self.frame_bytes = 0
+        self.duration = 0.0  # Seconds of recorded timeline, pauses excluded
+        self.backend = None
+        self.encoder = None
+
+    @property
+    def fps(self):
+        """Frames captured per second of recorded timeline."""
+        return self.frames / self.duration if self.duration > 0 else 0.0
+
+    def summary(self):
+        capture_ms = self.capture_seconds / self.frames * 1000 if self.frames else 0.0
+        return (f"{self.duration:.1f}s, {self.frames} frames at {self.fps:.1f} fps via {self.backend} -> {self.encoder}, "
+                f"{capture_ms:.1f} ms per capture, {self.late_frames} late, {self.dropped_frames} dropped, "
+                f"{self.duplicated_frames} duplicated")
+
+    def report(self):
+        """Multi-line session report, including the work change detection saved."""
+        converted = self.frames - self.unchanged_frames - self.dropped_frames - self.skipped_frames
+        per_convert_ms = self.convert_seconds / converted * 1000 if converted else 0.0
+        share = self.unchanged_frames / self.frames * 100 if self.frames else 0.0
+        detect_ms = self.detect_seconds / self.frames * 1000 if self.frames else 0.0
+        saved_mb = self.unchanged_frames * self.frame_bytes / 1e6
+        return "\n".join([
+            self.summary(),
+            f"Unchanged frames: {self.unchanged_frames} of {self.frames} ({share:.0f}%), "
+            f"skipping {saved_mb:.0f} MB of copies and {self.unchanged_frames * per_convert_ms / 1000:.1f}s of colour conversion",
+            f"Change detection: {detect_ms:.2f} ms per frame; conversion: {per_convert_ms:.2f} ms per changed frame",
+        ])
+
+
+class ScreenRecorder:
+    """Records the screen on a background thread at a steady frame rate.
+
+    Frames are captured as BGRA through screen_capture and paced against a
+    monotonic clock, so slow captures eat into the wait instead of adding to it.
+    Each frame is stamped on that clock and placed in its slot of the
+    constant-rate output, repeating the previous frame over any gap, so the
+    file's duration matches the time recorded. Pausing stops the clock.
+    Frames identical to the previous one are sent as duplicate markers, so a
+    static screen costs a grab and a compare per tick.
+    Encoding happens behind a bounded queue in recording_sink.
+
+    With replay_seconds set, nothing is written to output_file; the recorder
+    keeps only that many recent seconds in memory and save_replay() writes
+    them out on demand.
+    """
+
+    def __init__(self, output_file, fps=DEFAULT_FPS, backend=None, region=None, codec=DEFAULT_CODEC, crf=DEFAULT_CRF, preset=DEFAULT_PRESET,
+                 replay_seconds=None):
+        self.output_file = output_file
+        self.replay_seconds = replay_seconds
+        self.fps = fps
+        self.codec = codec
+        self.crf = crf
+        self.preset = preset
+        self.backend = backend
+        self.region = region
+        self.stats = RecordingStats()
+        self.clock = MediaClock()
+        self.detector = ChangeDetector()
+        self.error = None
+        self.sink = None
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def paused(self):
+        return self.clock.paused
+
+    def start(self):
+        """Start capturing; raises CaptureError or RecordingError if capture or the encoder cannot start."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self.error:
+            raise self.error
+
+    def pause(self):
+        self.clock.pause()
+
+    def resume(self):
+        self.clock.resume()
+
+    def save_replay(self, output_file):
+        """Write the replay buffer's recent seconds to output_file while recording carries on."""
+        if not self.replay_seconds or self.sink is None:
+            raise RecordingError("Not recording to a replay buffer")
+        return self.sink.dump(output_file)
+
+    def stop(self):
+        """Stop, finish the file and return the session stats; a replay buffer is discarded."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stats
+
+    def _run(self):
+        try:
+            # Backends such as XShm belong to the thread that opened them
+            capture = open_capture(self.backend, self.region)
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+            return
+        try:
+            sink = open_sink(self.output_file, capture.size, self.fps, self.codec, self.crf, self.preset, self.replay_seconds)
+        except Exception as e:
+            capture.close()
+            self.error = e
+            self._ready.set()
+            return
+        self.stats.backend = capture.name
+        self.stats.encoder = sink.encoder
+        self.sink = sink
+        self.stats.frame_bytes = capture.size[0] * capture.size[1] * 4
+        self._ready.set()
+        interval = 1.0 / self.fps
+        next_slot = 0  # Next frame of the output timeline to fill
+        next_frame = time.monotonic()
+        self.clock.start(next_frame)
+        try:
+            while not self._stop.is_set():
+                if self.clock.paused:
+                    self._stop.wait(interval)
+                    next_frame = time.monotonic()
+                    continue
+                before = time.monotonic()
+                frame = capture.grab()
+                after = time.monotonic()
+                self.stats.capture_seconds += after - before
+                self.stats.frames += 1
+                slot = round(self.clock.media_time((before + after) / 2) * self.fps)
+                if slot < next_slot:
+                    self.stats.skipped_frames += 1
+                else:
+                    # The previous frame stayed on screen until this one
+                    sink.duplicate(slot - next_slot)
+                    if not self.detector.changed(frame):
+                        self.stats.unchanged_frames += 1
+                        sink.duplicate(1)
+                    elif not sink.write(frame):
+                        self.stats.dropped_frames += 1
+                        self.detector.reset()
+                        sink.duplicate(1)
+                    next_slot = slot + 1
+                next_frame += interval
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                else:
+                    # Behind schedule: start a fresh schedule instead of bursting to catch up
+                    self.stats.late_frames += 1
+                    next_frame = time.monotonic()
+            # The last frame lasts until stop
+            end_slot = round(self.clock.media_time() * self.fps)
+            sink.duplicate(end_slot - next_slot)
+            next_slot = max(next_slot, end_slot)
+        except Exception as e:
+            self.error = e
+            print(f"Screen recording stopped: {e}")
+        finally:
+            self.stats.duration = next_slot / self.fps
+            capture.close()
+            try:
+                sink.close()
+            except Exception as e:
+                self.error = self.error or e
+            self.stats.duplicated_frames = sink.duplicated
+            self.stats.convert_seconds = sink.convert_seconds
+            self.stats.detect_seconds = self.detector.seconds
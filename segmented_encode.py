@@ -0,0 +1,165 @@
+import glob
+import os
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ffmpeg_jobs import FFmpegJob
+from ffmpeg_toolchain import ffmpeg_path
+from keyframe_index import KeyframeIndex
+from media_probe import probe_media, streams_of_type
+
+# Shorter sources are encoded in one pass; splitting them costs more than it saves
+SEGMENT_MIN_SECONDS = 120
+# Segments shorter than this leave the encoder too little lookahead to be worth it
+SEGMENT_MIN_LENGTH = 20
+
+
+def plan_segments(keyframes, duration, count):
+    """Pick up to count - 1 split times, each on a keyframe, spreading the video evenly."""
+    splits = []
+    for i in range(1, count):
+        seconds = keyframes.keyframe_before(i * duration / count)
+        if seconds - (splits[-1] if splits else 0.0) >= SEGMENT_MIN_LENGTH and duration - seconds >= SEGMENT_MIN_LENGTH:
+            splits.append(seconds)
+    return splits
+
+
+def _concat_entry(path):
+    # The concat demuxer reads single-quoted paths; a quote is written as '\''
+    return "file '" + path.replace("'", "'\\''") + "'\n"
+
+
+class SegmentedJob(FFmpegJob):
+    """Encode a long video as keyframe-aligned segments in parallel, then concat them losslessly.
+
+    The video stream is split with stream copy at keyframes, every segment is
+    encoded by its own FFmpeg process, audio is encoded once from the source to
+    avoid priming gaps at the joins, and the pieces are joined with the concat
+    demuxer. The result is checked against the source's duration and stream count.
+
+    Segments run on this job's queue worker plus whatever worker slots the
+    queue has idle, so the queue's worker limit holds; `workers` caps them further.
+    """
+
+    def __init__(self, source, output_file, video_args, audio_args, workers=None, priority=0, label=None):
+        command = [ffmpeg_path(), "-i", source, *video_args, *audio_args, output_file]
+        super().__init__(command, output_file, priority, label)
+        self.source = source
+        self.video_args = video_args
+        self.audio_args = audio_args
+        self.workers = workers
+        self.parts = []
+
+    def running_processes(self):
+        return [part.process for part in self.parts if part.process is not None and part.process.poll() is None]
+
+    def run(self, queue):
+        media = probe_media(self.source)
+        self.duration = media["duration"]
+        has_audio = bool(streams_of_type(media, "audio")) and self.audio_args != ["-an"]
+        workers = min(self.workers or queue.workers, queue.workers)
+        # Twice as many segments as workers so a slow segment does not leave the others idle
+        splits = plan_segments(KeyframeIndex.load(self.source), self.duration, workers * 2)
+        if not splits:
+            return super().run(queue)
+
+        workdir = tempfile.mkdtemp(prefix=".segments-", dir=os.path.dirname(os.path.abspath(self.output_file)))
+        try:
+            split = self._part([
+                ffmpeg_path(), "-i", self.source, "-map", "0:v:0", "-c", "copy",
+                "-f", "segment", "-segment_times", ",".join(f"{seconds - 0.001:.3f}" for seconds in splits),
+                "-reset_timestamps", "1", os.path.join(workdir, "source%04d.mkv"),
+            ])
+            if not self._run_parts(queue, [split]):
+                return False
+
+            encodes = []
+            for path in sorted(glob.glob(os.path.join(workdir, "source*.mkv"))):
+                encoded = os.path.join(workdir, os.path.basename(path).replace("source", "encoded"))
+                encodes.append(self._part([ffmpeg_path(), "-i", path, *self.video_args, "-an", encoded]))
+            audio_file = os.path.join(workdir, "audio.mka")
+            parts = list(encodes)
+            if has_audio:
+                # The one long serial task goes first so it overlaps the segment encodes
+                parts.insert(0, self._part([ffmpeg_path(), "-i", self.source, "-vn", *self.audio_args, audio_file]))
+            if not self._run_parts(queue, parts, workers, encodes):
+                return False
+
+            list_file = os.path.join(workdir, "segments.txt")
+            with open(list_file, "w", encoding="utf-8") as file:
+                file.writelines(_concat_entry(part.command[-1]) for part in encodes)
+            command = [ffmpeg_path(), "-f", "concat", "-safe", "0", "-i", list_file]
+            if has_audio:
+                command += ["-i", audio_file, "-map", "0:v", "-map", "1:a"]
+            concat = self._part([*command, "-c", "copy", self.output_file])
+            if not self._run_parts(queue, [concat]):
+                return False
+            return self._validate(media, has_audio)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _part(self, command):
+        part = FFmpegJob(command, command[-1], label=self.label)
+        self.parts.append(part)
+        return part
+
+    def _run_parts(self, queue, parts, workers=1, tracked=()):
+        """Run part commands, up to `workers` at once, mirroring the encodes' progress onto this job.
+
+        The first runs on this job's own worker slot; each further concurrent
+        one borrows an idle slot from the queue, checked again as parts finish.
+        """
+        waiting = list(parts)
+        futures = {}
+        active = {}  # future -> whether it runs on a borrowed slot
+        own_slot_free = True
+        failed = False
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while active or (waiting and not failed):
+                while waiting and not failed and len(active) < workers:
+                    if own_slot_free:
+                        own_slot_free = borrowed = False
+                    elif queue.borrow_slot():
+                        borrowed = True
+                    else:
+                        break
+                    part = waiting.pop(0)
+                    futures[part] = pool.submit(part._execute, queue, self)
+                    active[futures[part]] = borrowed
+                done, _ = wait(active, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if active.pop(future):
+                        queue.return_slot()
+                    else:
+                        own_slot_free = True
+                    if not failed and (future.exception() or not future.result()):
+                        # One failed segment fails the job; stop the rest instead of finishing them
+                        failed = True
+                        for process in self.running_processes():
+                            process.terminate()
+                if tracked:
+                    self.out_time = sum(part.out_time for part in tracked)
+                    self.fps = sum(part.fps for part in tracked if part.process and part.process.poll() is None)
+                    self.speed = sum(part.speed for part in tracked if part.process and part.process.poll() is None)
+                    self.progress = min(1.0, self.out_time / self.duration) if self.duration else 0.0
+        for part, future in futures.items():
+            if not future.result():  # Re-raises a part's exception
+                self.error = part.error
+                return False
+        return True
+
+    def _validate(self, source_media, has_audio):
+        """Check the joined file has the source's duration and the expected streams."""
+        output = probe_media(self.output_file, cache=False)
+        video_streams = len(streams_of_type(output, "video"))
+        audio_streams = len(streams_of_type(output, "audio"))
+        if video_streams != 1 or audio_streams != int(has_audio):
+            self.error = f"Segmented output has {video_streams} video and {audio_streams} audio streams"
+            return False
+        # Allow for a frame or so of drift at each join
+        tolerance = max(0.5, source_media["duration"] * 0.002)
+        if abs(output["duration"] - source_media["duration"]) > tolerance:
+            self.error = f"Segmented output is {output['duration']:.2f}s long, source is {source_media['duration']:.2f}s"
+            return False
+        return True
@@ -0,0 +1,166 @@
+"""Load test for conversion_service.py.
+
+    python service_loadtest.py --clients 16 --jobs 200
+    python service_loadtest.py --file talk.mkv --to mp4 --clients 4 --jobs 20
+
+Each client uploads the file with chunked transfer encoding, creates a job,
+follows its event stream to the end and downloads the output with a Range
+request. Reports jobs per second and latency percentiles per phase.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import time
+
+CHUNK_SIZE = 256 * 1024
+
+
+def sample_image():
+    """A generated PNG, so the default run needs no input file."""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.effect_noise((640, 480), 64).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+async def request(host, port, method, path, body=None, headers=None, chunked=False):
+    """Send one request on a fresh connection; returns (status, headers, reader, writer)."""
+    reader, writer = await asyncio.open_connection(host, port)
+    headers = dict(headers or {})
+    if chunked:
+        headers["Transfer-Encoding"] = "chunked"
+    elif body is not None:
+        headers["Content-Length"] = len(body)
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if chunked:
+        for start in range(0, len(body), CHUNK_SIZE):
+            chunk = body[start:start + CHUNK_SIZE]
+            writer.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+    elif body is not None:
+        writer.write(body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    return status, response_headers, reader, writer
+
+
+async def request_json(host, port, method, path, body=None, **kwargs):
+    status, headers, reader, writer = await request(host, port, method, path, body, **kwargs)
+    data = await reader.readexactly(int(headers.get("content-length", 0)))
+    writer.close()
+    return status, json.loads(data or b"{}")
+
+
+async def run_job(host, port, payload, filename, target_format, timings):
+    started = time.perf_counter()
+    status, upload = await request_json(host, port, "POST", f"/uploads?filename={filename}", payload, chunked=True)
+    if status != 201:
+        raise RuntimeError(f"upload: {status} {upload}")
+    uploaded = time.perf_counter()
+
+    body = json.dumps({"upload": upload["upload"], "to": target_format}).encode("utf-8")
+    while True:
+        status, created = await request_json(host, port, "POST", "/jobs", body)
+        if status != 429:
+            break
+        timings["rejected"] += 1
+        await asyncio.sleep(0.1)  # Queue full; back off and retry
+    if status != 202:
+        raise RuntimeError(f"create job: {status} {created}")
+
+    job_id = created["job"]
+    status, _, reader, writer = await request(host, port, "GET", f"/jobs/{job_id}/events")
+    state = None
+    async for line in reader:
+        if line.startswith(b"event: "):
+            state = line[7:].strip().decode("ascii")
+    writer.close()
+    if state != "done":
+        raise RuntimeError(f"job {job_id} ended as {state}")
+    converted = time.perf_counter()
+
+    # Fetch the output in two ranges, as a resuming client would
+    status, headers, reader, writer = await request(host, port, "GET", f"/jobs/{job_id}/output", headers={"Range": "bytes=0-65535"})
+    size = int(headers["content-range"].rsplit("/", 1)[1]) if status == 206 else int(headers["content-length"])
+    received = len(await reader.read())
+    writer.close()
+    if received < size:
+        status, headers, reader, writer = await request(host, port, "GET", f"/jobs/{job_id}/output", headers={"Range": f"bytes={received}-"})
+        received += len(await reader.read())
+        writer.close()
+    if received != size:
+        raise RuntimeError(f"job {job_id}: downloaded {received} of {size} bytes")
+    finished = time.perf_counter()
+
+    timings["upload"].append(uploaded - started)
+    timings["convert"].append(converted - uploaded)
+    timings["download"].append(finished - converted)
+    timings["total"].append(finished - started)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def main_async(args):
+    if args.file:
+        with open(args.file, "rb") as file:
+            payload = file.read()
+        filename = os.path.basename(args.file)
+    else:
+        payload = sample_image()
+        filename = "sample.png"
+    timings = {"upload": [], "convert": [], "download": [], "total": [], "rejected": 0}
+    errors = []
+    remaining = iter(range(args.jobs))
+
+    async def client():
+        for _ in remaining:
+            try:
+                await run_job(args.host, args.port, payload, filename, args.to, timings)
+            except (OSError, RuntimeError, ValueError) as e:
+                errors.append(str(e))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    done = len(timings["total"])
+    print(f"{done} jobs in {elapsed:.2f}s: {done / elapsed:.2f} jobs/sec, {len(errors)} failed, {timings['rejected']} retries after 429")
+    for phase in ("upload", "convert", "download", "total"):
+        values = timings[phase]
+        if values:
+            print(f"  {phase:<9} p50 {statistics.median(values) * 1000:8.1f} ms   p95 {percentile(values, 0.95) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+    for error in errors[:5]:
+        print(f"  error: {error}")
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the local conversion service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--jobs", type=int, default=50, help="jobs in total")
+    parser.add_argument("--file", help="file to upload (default: a generated PNG)")
+    parser.add_argument("--to", default="jpg", help="target format")
+    args = parser.parse_args(argv)
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+from ffmpeg_toolchain import TARGET_CODECS, audio_codec_args, video_codec_args
+from media_probe import streams_of_type
+
+# Codecs each target container can carry as-is, i.e. with -c copy
+CONTAINER_CODECS = {
+    "mp4": {"video": {"h264", "hevc", "mpeg4", "av1", "vp9"}, "audio": {"aac", "mp3", "ac3", "eac3", "opus", "alac", "flac"}},
+    "mov": {"video": {"h264", "hevc", "mpeg4", "prores", "mjpeg"}, "audio": {"aac", "mp3", "alac", "ac3", "pcm_s16le", "pcm_s24le"}},
+    "mkv": {
+        "video": {"h264", "hevc", "vp8", "vp9", "av1", "mpeg4", "mpeg2video", "mjpeg", "theora", "prores"},
+        "audio": {"aac", "mp3", "opus", "vorbis", "flac", "ac3", "eac3", "dts", "alac", "pcm_s16le", "pcm_s24le"},
+    },
+    "webm": {"video": {"vp8", "vp9", "av1"}, "audio": {"opus", "vorbis"}},
+    "avi": {"video": {"mpeg4", "h264", "mjpeg", "msmpeg4v3"}, "audio": {"mp3", "ac3", "pcm_s16le"}},
+    "mp3": {"audio": {"mp3"}},
+    "wav": {"audio": {"pcm_s16le", "pcm_s24le", "pcm_f32le"}},
+    "flac": {"audio": {"flac"}},
+    "ogg": {"audio": {"vorbis", "opus", "flac"}},
+    "m4a": {"audio": {"aac", "alac"}},
+    "aac": {"audio": {"aac"}},
+}
+
+
+def parse_bitrate(value):
+    """Turn "500k" / "2M" / "128000" into bits per second."""
+    value = str(value).strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+
+# Lossless audio is always above the quality presets' caps
+LOSSLESS_AUDIO = {"flac", "alac", "pcm_s16le", "pcm_s24le", "pcm_f32le"}
+
+
+def _stream_bitrate(stream, media):
+    """Known or upper-bound bitrate of a stream, or None if there is no telling."""
+    if str(stream.get("bit_rate", "")).isdigit():
+        return int(stream["bit_rate"])
+    # Matroska rarely reports per-stream rates; the container total bounds the video
+    # stream, but says nothing useful about the audio next to it
+    if stream.get("codec_type") == "video" or len(media["streams"]) == 1:
+        return media.get("bit_rate")
+    return None
+
+
+def _copy_blocker(stream, media, supported, max_bitrate=None, size=None):
+    """Return why a stream cannot be copied into the target, or None if it can."""
+    if "codec_name" not in stream:
+        return "the source could not be probed"
+    codec = stream["codec_name"]
+    if codec not in supported:
+        return f"the container cannot hold {codec}"
+    if size and (stream.get("width"), stream.get("height")) != size:
+        return f"resizing {stream.get('width')}x{stream.get('height')} to {size[0]}x{size[1]}"
+    if max_bitrate:
+        bitrate = _stream_bitrate(stream, media)
+        if bitrate is None:
+            if stream.get("codec_type") == "audio" and codec not in LOSSLESS_AUDIO:
+                return None  # Lossy audio next to video is small enough to keep
+            return f"source bitrate unknown, capping at {max_bitrate}"
+        if bitrate > parse_bitrate(max_bitrate):
+            return f"source bitrate {bitrate // 1000}k is above {max_bitrate}"
+    return None
+
+
+class StreamPlan:
+    """Per-stream copy or re-encode decisions for one conversion, with the reasons."""
+
+    def __init__(self):
+        self.args = []
+        self.notes = []
+        self.copied = []
+        self.encoded = []
+
+    @property
+    def mode(self):
+        """Either remux (every kept stream copied), partial or encode."""
+        if self.copied and not self.encoded:
+            return "remux"
+        return "partial" if self.copied else "encode"
+
+
+def plan_streams(media, target_format, video_bitrate=None, audio_bitrate=None, size=None, crf=None, preset=None):
+    """Plan the codec arguments for converting probed `media` into `target_format`.
+
+    Streams whose codec the target container supports, and that already meet the
+    requested bitrate cap and frame size, are stream-copied; the rest are re-encoded.
+    Pass media=None when probing failed to re-encode everything.
+    """
+    plan = StreamPlan()
+    if target_format not in TARGET_CODECS:
+        # An image or document target: neither copying nor picking encoders applies
+        plan.notes.append(f"plan: FFmpeg defaults, {target_format} is not an audio or video format")
+        return plan
+    if media is None:
+        # Probing failed; re-encode whatever streams FFmpeg finds
+        media = {"streams": [{"codec_type": "video"}, {"codec_type": "audio"}]}
+    video_family, audio_family = TARGET_CODECS[target_format]
+    supported = CONTAINER_CODECS.get(target_format, {})
+    videos = streams_of_type(media, "video")
+    audios = streams_of_type(media, "audio")
+
+    if video_family is None:
+        plan.args += ["-vn"]
+        if videos:
+            plan.notes.append(f"video: dropped, {target_format} is audio-only")
+    elif videos:
+        stream = videos[0]
+        reason = _copy_blocker(stream, media, supported.get("video", set()), video_bitrate, size)
+        if reason is None:
+            plan.args += ["-c:v", "copy"]
+            plan.copied.append(stream)
+            plan.notes.append(f"video: copy {stream.get('codec_name')}, {target_format} supports it as-is")
+        else:
+            args = video_codec_args(target_format, crf, preset)
+            if size:
+                args += ["-vf", f"scale={size[0]}:{size[1]}"]
+            if video_bitrate:
+                args += ["-b:v", video_bitrate]
+            plan.args += args
+            plan.encoded.append(stream)
+            encoder = args[1] if args[:1] == ["-c:v"] else "default encoder"
+            plan.notes.append(f"video: re-encode {stream.get('codec_name')} with {encoder}, {reason}")
+
+    if audio_family is None:
+        plan.args += ["-an"]
+        if audios:
+            plan.notes.append(f"audio: dropped, {target_format} has no audio")
+    elif audios:
+        stream = audios[0]
+        reason = _copy_blocker(stream, media, supported.get("audio", set()), audio_bitrate)
+        if reason is None:
+            plan.args += ["-c:a", "copy"]
+            plan.copied.append(stream)
+            plan.notes.append(f"audio: copy {stream.get('codec_name')}, {target_format} supports it as-is")
+        else:
+            args = audio_codec_args(target_format, audio_bitrate)
+            plan.args += args
+            plan.encoded.append(stream)
+            encoder = args[1] if args[:1] == ["-c:a"] else "default encoder"
+            plan.notes.append(f"audio: re-encode {stream.get('codec_name')} with {encoder}, {reason}")
+
+    plan.notes.insert(0, f"plan: {plan.mode}")
+    return plan
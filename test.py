@@ -14,6 +14,15 @@ import zipfile
 from pygame import mixer
 import re
 
+from ffmpeg_jobs import DONE, FAILED, FFmpegJob, FFmpegJobQueue
+from ffmpeg_toolchain import ffmpeg_available, ffmpeg_path
+from job_panel import REFRESH_INTERVAL_MS, JobPanel
+from media_probe import probe_media
+from output_cache import OutputCache
+from stream_plan import plan_streams
+from thumbnails import ScrubPreview, ThumbnailStrip
+from video_engine import DisplaySink, VideoEngine
+
 # Set theme
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
@@ -22,56 +31,53 @@ ctk.set_default_color_theme("blue")
 mixer.init()
 
 def install_ffmpeg():
-    """Install FFmpeg automatically if it's not already installed."""
-    try:
-        # Check if FFmpeg is installed
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    """Install FFmpeg automatically if it's not already installed. Returns True once FFmpeg is usable."""
+    if ffmpeg_available():
         print("FFmpeg is already installed.")
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("FFmpeg not found. Installing FFmpeg...")
-        try:
-            if sys.platform == "win32":
-                # Download FFmpeg for Windows
-                ffmpeg_url = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
-                ffmpeg_zip = "ffmpeg.zip"
-                ffmpeg_dir = "ffmpeg"
-
-                # Download FFmpeg
-                print("Downloading FFmpeg...")
-                response = requests.get(ffmpeg_url, stream=True)
-                with open(ffmpeg_zip, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-
-                # Extract FFmpeg
-                print("Extracting FFmpeg...")
-                with zipfile.ZipFile(ffmpeg_zip, "r") as zip_ref:
-                    zip_ref.extractall(ffmpeg_dir)
-
-                # Move FFmpeg executable to the current directory
-                for root, dirs, files in os.walk(ffmpeg_dir):
-                    if "ffmpeg.exe" in files:
-                        ffmpeg_path = os.path.join(root, "ffmpeg.exe")
-                        shutil.move(ffmpeg_path, ".")
-                        break
-
-                # Clean up
-                os.remove(ffmpeg_zip)
-                shutil.rmtree(ffmpeg_dir)
-
-                print("FFmpeg installed successfully.")
-            elif sys.platform == "darwin":  # macOS
-                subprocess.run(["brew", "install", "ffmpeg"], check=True)
-            elif sys.platform == "linux":  # Linux
-                subprocess.run(["sudo", "apt-get", "install", "ffmpeg", "-y"], check=True)
-            else:
-                raise Exception("Unsupported operating system.")
-        except Exception as e:
-            print(f"Failed to install FFmpeg: {e}")
-            messagebox.showerror("Error", "Failed to install FFmpeg. Please install it manually.")
+        return True
 
-# Install FFmpeg if not already installed
-install_ffmpeg()
+    print("FFmpeg not found. Installing FFmpeg...")
+    try:
+        if sys.platform == "win32":
+            # Download FFmpeg for Windows
+            ffmpeg_url = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
+            ffmpeg_zip = "ffmpeg.zip"
+            ffmpeg_dir = "ffmpeg"
+
+            # Download FFmpeg
+            print("Downloading FFmpeg...")
+            response = requests.get(ffmpeg_url, stream=True)
+            with open(ffmpeg_zip, "wb") as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+
+            # Extract FFmpeg
+            print("Extracting FFmpeg...")
+            with zipfile.ZipFile(ffmpeg_zip, "r") as zip_ref:
+                zip_ref.extractall(ffmpeg_dir)
+
+            # Move FFmpeg executable to the current directory
+            for root, dirs, files in os.walk(ffmpeg_dir):
+                if "ffmpeg.exe" in files:
+                    ffmpeg_path = os.path.join(root, "ffmpeg.exe")
+                    shutil.move(ffmpeg_path, ".")
+                    break
+
+            # Clean up
+            os.remove(ffmpeg_zip)
+            shutil.rmtree(ffmpeg_dir)
+
+            print("FFmpeg installed successfully.")
+        elif sys.platform == "darwin":  # macOS
+            subprocess.run(["brew", "install", "ffmpeg"], check=True)
+        elif sys.platform == "linux":  # Linux
+            subprocess.run(["sudo", "apt-get", "install", "ffmpeg", "-y"], check=True)
+        else:
+            raise Exception("Unsupported operating system.")
+    except Exception as e:
+        print(f"Failed to install FFmpeg: {e}")
+        return False
+    return ffmpeg_available()
 
 class ConverterApp:
     def __init__(self, root):
@@ -117,12 +123,19 @@ class ConverterApp:
         self.conversion_percentage_label = ctk.CTkLabel(self.sidebar, text="0%", fg_color="transparent", text_color="white")
         self.conversion_percentage_label.pack(pady=5)
 
+        # Conversion job queue with per-job progress
+        self.job_queue = FFmpegJobQueue()
+        self.output_cache = OutputCache()
+        self.job_panel = JobPanel(self.sidebar, self.job_queue)
+        self.job_panel.frame.pack(pady=10, fill="x")
+
         # Main Player Frame (Auto-Resize)
         self.main_frame = ctk.CTkFrame(root, fg_color="black")
         self.main_frame.grid(row=0, column=1, padx=5, pady=5, sticky="nsew")
 
         self.video_label = tk.Label(self.main_frame, text="Video Player", bg="black", fg="white")
         self.video_label.pack(fill="both", expand=True, padx=10, pady=10)
+        self.display_sink = DisplaySink(self.video_label)
 
         # Footer (Fixed at the bottom)
         self.footer = ctk.CTkFrame(root, fg_color="#333")
@@ -135,6 +148,10 @@ class ConverterApp:
 
         # Bind click event to progress bar for seeking
         self.video_progress_bar.bind("<Button-1>", self.seek_video)
+        self.video_progress_bar.bind("<B1-Motion>", self.seek_video)
+
+        # Thumbnail tooltip while hovering the progress bar
+        self.scrub_preview = ScrubPreview(self.video_progress_bar)
 
         # Control Buttons (Centered)
         self.button_frame = ctk.CTkFrame(self.footer, fg_color="#333")
@@ -155,17 +172,39 @@ class ConverterApp:
         self.forward_button = ctk.CTkButton(self.button_frame, text="⏩ +10s", command=self.forward_video, state=tk.DISABLED)
         self.forward_button.pack(side="left", padx=5)
 
+        self.step_back_button = ctk.CTkButton(self.button_frame, text="⏮ Frame", command=self.step_back, state=tk.DISABLED)
+        self.step_back_button.pack(side="left", padx=5)
+
+        self.step_forward_button = ctk.CTkButton(self.button_frame, text="⏭ Frame", command=self.step_forward, state=tk.DISABLED)
+        self.step_forward_button.pack(side="left", padx=5)
+
         self.fullscreen_button = ctk.CTkButton(self.button_frame, text="🔳 Full Screen", command=self.full_screen, state=tk.DISABLED)
         self.fullscreen_button.pack(side="left", padx=5)
 
+        # Measured vs target playback frame rate
+        self.fps_label = ctk.CTkLabel(self.button_frame, text="", fg_color="transparent")
+        self.fps_label.pack(side="left", padx=5)
+
         # Variables
         self.selected_file = None
         self.cap = None
+        self.video_engine = None
+        self.frame_buffer_depth = 8  # Decoded frames kept ready ahead of the display
+        self.frame_cache_mb = 256  # Memory ceiling for recently decoded frames (stepping/back-seek)
+        self.thumbnail_strip = None
         self.media_playing = False
         self.media_paused = False
         self.total_frames = 0
         self.current_frame = 0
-        self.conversion_process = None
+        self.reported_jobs = set()
+        self.refresh_jobs()
+
+        # Check for FFmpeg in the background so the window shows up straight away
+        threading.Thread(target=self.check_ffmpeg, daemon=True).start()
+
+    def check_ffmpeg(self):
+        if not install_ffmpeg():
+            self.root.after(0, lambda: messagebox.showerror("Error", "Failed to install FFmpeg. Please install it manually."))
 
     def select_file(self):
         self.selected_file = filedialog.askopenfilename()
@@ -187,44 +226,57 @@ class ConverterApp:
                 # Get selected quality
                 quality = self.quality_var.get()
                 if quality == "480p":
-                    resolution = "854x480"
+                    resolution = (854, 480)
                 elif quality == "720p":
-                    resolution = "1280x720"
+                    resolution = (1280, 720)
                 elif quality == "1080p":
-                    resolution = "1920x1080"
+                    resolution = (1920, 1080)
                 else:
-                    resolution = "1280x720"  # Default to 720p
+                    resolution = (1280, 720)  # Default to 720p
 
-                command = ["ffmpeg", "-i", self.selected_file, "-vf", f"scale={resolution}", output_file]
-                self.conversion_process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-
-                # Thread to monitor conversion progress
-                threading.Thread(target=self.monitor_conversion, args=(self.conversion_process,), daemon=True).start()
+                # Video already at the chosen resolution is copied rather than re-encoded
+                plan = self.plan_conversion(target_format, size=resolution)
+                command = [ffmpeg_path(), "-i", self.selected_file, *plan.args, output_file]
+                self.queue_conversion(command, output_file, target_format, plan.notes)
             except Exception as e:
                 messagebox.showerror("Error", f"Conversion failed: {e}")
 
-    def monitor_conversion(self, process):
-        """Monitor FFmpeg conversion progress and update the progress bar."""
-        duration = 0
-        for line in process.stderr:
-            if "Duration" in line:
-                match = re.search(r"Duration: (\d+):(\d+):(\d+).\d+", line)
-                if match:
-                    duration = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + int(match.group(3))
-            if "time=" in line:
-                match = re.search(r"time=(\d+):(\d+):(\d+).\d+", line)
-                if match and duration > 0:
-                    current_time = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + int(match.group(3))
-                    progress = current_time / duration
-                    self.conversion_progress_var.set(progress)
-                    self.conversion_percentage_label.configure(text=f"{int(progress * 100)}%")
-                    self.root.update_idletasks()
-
-        process.wait()
-        if process.returncode == 0:
-            messagebox.showinfo("Success", "File converted successfully!")
-        else:
-            messagebox.showerror("Error", "Conversion failed.")
+    def queue_conversion(self, command, output_file, target_format, notes=()):
+        """Hand an FFmpeg command to the job queue; its progress shows up in the jobs panel."""
+        job = FFmpegJob(command, output_file)
+        job.notes.extend(notes)
+        for note in notes:
+            print(f"{job.label}: {note}")
+        # Everything between the input and the output file describes the settings
+        job.use_cache(self.output_cache, self.selected_file, target_format, command[3:-1])
+        return self.job_queue.submit_job(job)
+
+    def plan_conversion(self, target_format, **limits):
+        """Probe the selected file and decide per stream whether to copy or re-encode it."""
+        try:
+            media = probe_media(self.selected_file)
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            media = None
+        return plan_streams(media, target_format, **limits)
+
+    def refresh_jobs(self):
+        """Poll the job queue from the Tk main loop and report finished jobs."""
+        self.job_panel.refresh()
+        active = self.job_queue.active_jobs()
+        if active:
+            progress = sum(job.progress for job in active) / len(active)
+            self.conversion_progress_var.set(progress)
+            self.conversion_percentage_label.configure(text=f"{int(progress * 100)}%")
+
+        for job in self.job_queue.jobs:
+            if job.finished and job.id not in self.reported_jobs:
+                self.reported_jobs.add(job.id)
+                if job.state == DONE:
+                    messagebox.showinfo("Success", f"{job.label} converted successfully!")
+                elif job.state == FAILED:
+                    messagebox.showerror("Error", f"Conversion of {job.label} failed: {job.error}")
+
+        self.root.after(REFRESH_INTERVAL_MS, self.refresh_jobs)
 
     def play_media(self):
         if not self.selected_file:
@@ -240,8 +292,10 @@ class ConverterApp:
             self.stop_button.configure(state=tk.NORMAL)
             self.forward_button.configure(state=tk.NORMAL)
             self.backward_button.configure(state=tk.NORMAL)
+            self.step_back_button.configure(state=tk.NORMAL)
+            self.step_forward_button.configure(state=tk.NORMAL)
 
-            threading.Thread(target=self.play_video, daemon=True).start()
+            self.play_video()
 
         elif file_extension in [".mp3", ".wav", ".flac"]:
             mixer.music.load(self.selected_file)
@@ -252,39 +306,88 @@ class ConverterApp:
             self.stop_button.configure(state=tk.NORMAL)
 
     def play_video(self):
-        self.cap = cv2.VideoCapture(self.selected_file)
-        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        """Start the decode thread and drain its frame buffer from the Tk main loop."""
+        if self.video_engine:
+            self.video_engine.stop()
+        self.video_engine = VideoEngine(
+            self.selected_file, buffer_depth=self.frame_buffer_depth, cache_bytes=self.frame_cache_mb * 1024 * 1024
+        )
+        self.total_frames = self.video_engine.total_frames
+        self.display_sink.set_source_size(self.video_engine.frame_width, self.video_engine.frame_height)
+        self.video_engine.set_target_size(*self.display_sink.target_size)
+        self.video_engine.start()
+        self.load_thumbnails()
+        self.update_video_frame()
+
+    def load_thumbnails(self):
+        """Generate (or load cached) scrub thumbnails for the selected video."""
+        if self.thumbnail_strip and self.thumbnail_strip.path == self.selected_file:
+            return
+        if self.thumbnail_strip:
+            self.thumbnail_strip.cancel()
+        self.thumbnail_strip = ThumbnailStrip(self.selected_file, self.video_engine.duration)
+        self.thumbnail_strip.start()
+        self.scrub_preview.strip = self.thumbnail_strip
+
+    def update_video_frame(self):
+        """Show the next due frame from the decode thread and reschedule on the Tk loop."""
+        engine = self.video_engine
+        if engine is None:
+            return
+        if not self.media_playing:
+            engine.stop()
+            return
+        engine.set_target_size(*self.display_sink.target_size)
 
-        while self.cap.isOpened() and self.media_playing:
-            if self.media_paused:
-                time.sleep(0.1)
-                continue
+        video_frame = engine.next_frame()
+        if video_frame is not None:
+            self.show_video_frame(video_frame)
 
-            ret, frame = self.cap.read()
-            if not ret:
-                break  
+            # Report measured against target frame rate about twice a second
+            if not self.media_paused and self.current_frame % max(1, int(engine.fps / 2)) == 0:
+                self.fps_label.configure(text=f"{engine.measured_fps:.1f} / {engine.fps:.2f} fps")
 
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            width, height = self.video_label.winfo_width(), self.video_label.winfo_height()
-            frame = cv2.resize(frame, (width, height))
+        if engine.finished:
+            engine.stop()
+            self.media_playing = False
+            self.play_button.configure(state=tk.NORMAL)
+            self.pause_button.configure(state=tk.DISABLED)
+            self.stop_button.configure(state=tk.DISABLED)
+            return
 
-            img = Image.fromarray(frame)
-            imgtk = ImageTk.PhotoImage(image=img)
+        self.root.after(engine.poll_interval_ms, self.update_video_frame)
 
-            self.video_label.configure(image=imgtk)
-            self.video_label.image = imgtk
+    def show_video_frame(self, video_frame):
+        self.display_sink.show(video_frame.image)
+        self.current_frame = video_frame.index
+        self.video_progress_var.set(self.current_frame / max(self.total_frames, 1))
 
-            self.current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-            self.video_progress_var.set(self.current_frame / self.total_frames)
+    def step_frame(self, delta):
+        """Pause and move by single frames, served from the decoded-frame cache when possible."""
+        if not self.video_engine:
+            return
+        if not self.media_paused:
+            self.pause_media()
+        video_frame = self.video_engine.step(delta)
+        if video_frame is not None:
+            self.show_video_frame(video_frame)
+        cache = self.video_engine.frame_cache
+        self.fps_label.configure(text=f"cache {cache.hits} hit / {cache.misses} miss, {cache.size_bytes // (1024 * 1024)} MB")
 
-            self.root.update_idletasks()
-            self.root.update()
+    def step_back(self):
+        self.step_frame(-1)
 
-        self.cap.release()
+    def step_forward(self):
+        self.step_frame(1)
 
     def pause_media(self):
         self.media_paused = not self.media_paused
         self.pause_button.configure(text="▶ Resume" if self.media_paused else "⏸ Pause")
+        if self.video_engine:
+            if self.media_paused:
+                self.video_engine.pause()
+            else:
+                self.video_engine.resume()
 
     def stop_media(self):
         self.media_playing = False
@@ -294,21 +397,19 @@ class ConverterApp:
         self.video_progress_var.set(0)
 
     def forward_video(self):
-        if self.cap:
-            self.current_frame += 300  # Forward by 10 seconds (300 frames approx)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+        if self.video_engine:
+            self.video_engine.seek_time(self.video_engine.position + 10)  # Forward by 10 seconds
 
     def backward_video(self):
-        if self.cap:
-            self.current_frame -= 300  # Backward by 10 seconds (300 frames approx)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+        if self.video_engine:
+            self.video_engine.seek_time(self.video_engine.position - 10)  # Backward by 10 seconds
 
     def seek_video(self, event):
         """Seek to a specific position in the video based on progress bar click."""
-        if self.cap:
+        if self.video_engine:
             progress = event.x / self.video_progress_bar.winfo_width()
             self.current_frame = int(progress * self.total_frames)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+            self.video_engine.seek(self.current_frame)
 
     def full_screen(self):
         self.root.attributes("-fullscreen", True)
@@ -0,0 +1,387 @@
+import csv
+import mmap
+import os
+import threading
+import tkinter as tk
+from tkinter import font as tkfont
+from collections import OrderedDict
+from itertools import islice
+
+from app_cache import cache_dir, file_key, load_json, save_json
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+openpyxl = lazy_import("openpyxl")
+pd = lazy_import("pandas")  # .xls only; openpyxl cannot read it
+Document = lazy_import("docx", "Document")  # For DOCX handling
+
+# Only every Nth line start is remembered; the lines in between are found by scanning
+LINE_CHECKPOINT = 256
+INDEX_CHUNK = 16 * 1024 * 1024
+# A line longer than this is cut for display, so one huge line cannot exhaust memory
+MAX_LINE_BYTES = 64 * 1024
+MAX_COLUMN_WIDTH = 40
+SHEET_PAGE_ROWS = 500
+# Sheets longer than this are copied to a CSV once so any row can be reached directly
+SHEET_SPOOL_ROWS = 4000
+# UTF-16 has no single-byte newline to index; small files are decoded whole instead
+MAX_UTF16_BYTES = 64 * 1024 * 1024
+POLL_MS = 200
+
+
+class LineIndex:
+    """Line offsets of a memory-mapped text file, indexed once in the background and cached on disk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        # mmap refuses empty files
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.checkpoints = [0]
+        self.line_count = 0
+        self.complete = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._build, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._closed = True
+        self._thread.join()
+        if self.size:
+            self.data.close()
+        self.file.close()
+
+    def _build(self):
+        key = file_key(self.path)
+        cached = load_json("line_index", key)
+        if cached is not None and cached.get("every") == LINE_CHECKPOINT:
+            self.checkpoints = cached["checkpoints"]
+            self.line_count = cached["lines"]
+            self.complete = True
+            return
+        newlines = 0
+        start = 0
+        # Plain reads rather than the mmap, so the scan does not leave the whole file mapped in
+        with open(self.path, "rb") as file:
+            for chunk in iter(lambda: file.read(INDEX_CHUNK), b""):
+                if self._closed:
+                    return
+                # Line n starts right after the n-th newline
+                ends = np.flatnonzero(np.frombuffer(chunk, np.uint8) == 10)
+                numbers = newlines + 1 + np.arange(len(ends))
+                picked = ends[numbers % LINE_CHECKPOINT == 0] + start + 1
+                self.checkpoints.extend(int(offset) for offset in picked if offset < self.size)
+                newlines += len(ends)
+                start += len(chunk)
+                self.line_count = newlines  # Lines known so far; readers may use them already
+        # A last line without a trailing newline still counts
+        self.line_count = newlines + (1 if self.size and self.data[self.size - 1] != 10 else 0)
+        self.complete = True
+        save_json("line_index", key, {"path": self.path, "every": LINE_CHECKPOINT, "checkpoints": self.checkpoints, "lines": self.line_count})
+
+    def lines(self, start, count):
+        """Up to `count` decoded lines from line `start` on, as far as the index reaches."""
+        count = min(count, self.line_count - start)
+        checkpoint = start // LINE_CHECKPOINT
+        if count <= 0 or checkpoint >= len(self.checkpoints):
+            return []
+        pos = self.checkpoints[checkpoint]
+        for _ in range(start % LINE_CHECKPOINT):
+            pos = self.line_end(pos) + 1
+        lines = []
+        while len(lines) < count and pos < self.size:
+            end = self.line_end(pos)
+            raw = self.data[pos:min(end, pos + MAX_LINE_BYTES)]
+            # utf-8-sig drops a byte order mark at the start of the file
+            lines.append(raw.decode("utf-8-sig" if pos == 0 else "utf-8", errors="replace").rstrip("\r"))
+            pos = end + 1
+        return lines
+
+    def line_end(self, pos):
+        """Offset of the newline ending the line that starts at `pos` (or the file size)."""
+        end = self.data.find(b"\n", pos)
+        return self.size if end < 0 else end
+
+
+class TextDocument:
+    """A plain text file shown line by line."""
+
+    header = None
+
+    def __init__(self, path):
+        self.index = LineIndex(path)
+
+    @property
+    def row_count(self):
+        return self.index.line_count
+
+    @property
+    def complete(self):
+        return self.index.complete
+
+    def view_lines(self, start, count):
+        return self.index.lines(start, count)
+
+    def close(self):
+        self.index.close()
+
+
+def format_table(header, rows):
+    """Align cells in columns as wide as the widest visible value, capped at MAX_COLUMN_WIDTH."""
+    rows = [["" if value is None else str(value) for value in row] for row in rows]
+    header = ["" if value is None else str(value) for value in header or []]
+    columns = max([len(header)] + [len(row) for row in rows])
+    widths = [0] * columns
+    for row in [header] + rows:
+        for i, value in enumerate(row):
+            widths[i] = min(MAX_COLUMN_WIDTH, max(widths[i], len(value)))
+
+    def line(row):
+        return "  ".join(value[:widths[i]].ljust(widths[i]) for i, value in enumerate(row)).rstrip()
+
+    return (line(header) if header else None), [line(row) for row in rows]
+
+
+class CSVDocument(TextDocument):
+    """A CSV file indexed like text; only the visible rows are parsed. Quoted newlines split a row."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        # Read directly; the index may not have reached even the first line yet
+        first_line = self.index.data[:min(self.index.line_end(0), MAX_LINE_BYTES)].decode("utf-8-sig", errors="replace")
+        self.header_cells = next(csv.reader([first_line.rstrip("\r")]), [])
+        self.header = ""
+
+    @property
+    def row_count(self):
+        return max(0, self.index.line_count - 1)
+
+    def view_lines(self, start, count):
+        rows = list(csv.reader(self.index.lines(start + 1, count)))
+        self.header, lines = format_table(self.header_cells, rows)
+        return lines
+
+
+class SheetDocument:
+    """The first sheet of an .xlsx workbook, read in pages of rows with an LRU of recent pages.
+
+    openpyxl's read-only mode parses the sheet XML front to back, so a page far
+    down costs a pass over every row before it. Long sheets are therefore copied
+    once, in the background, to a cached CSV that is then previewed like any
+    other CSV; until that is done, pages are read from the workbook.
+    """
+
+    def __init__(self, path, cached_pages=8):
+        self.path = path
+        self.workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        self.sheet = self.workbook.worksheets[0]
+        self.header_cells = next(self.sheet.iter_rows(max_row=1, values_only=True), ())
+        self.header = ""
+        max_row = self.sheet.max_row
+        if max_row is None:
+            # No dimension record in the file; count the rows once, streaming
+            max_row = sum(1 for _ in self.sheet.iter_rows(values_only=True))
+        self.row_count = max(0, max_row - 1)
+        self.cached_pages = cached_pages
+        self.pages = OrderedDict()
+        self.spooled = None
+        self._closed = False
+        self._thread = None
+        if self.row_count > SHEET_SPOOL_ROWS:
+            self.spool_path = os.path.join(cache_dir("sheet_preview"), f"{file_key(path)}.csv")
+            if os.path.exists(self.spool_path):
+                self.spooled = CSVDocument(self.spool_path)
+            else:
+                self._thread = threading.Thread(target=self._spool, daemon=True)
+                self._thread.start()
+
+    @property
+    def complete(self):
+        if self.spooled is not None:
+            return self.spooled.complete
+        return self._thread is None
+
+    def _spool(self):
+        tmp_path = f"{self.spool_path}.{os.getpid()}.tmp"
+        # A second read-only handle; the UI thread keeps using the first one
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            with open(tmp_path, "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                for row in workbook.worksheets[0].iter_rows(values_only=True):
+                    if self._closed:
+                        return
+                    writer.writerow(["" if value is None else value for value in row])
+            os.replace(tmp_path, self.spool_path)
+            if not self._closed:
+                self.spooled = CSVDocument(self.spool_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Sheet preview copy failed for {self.path}: {e}")
+            self._thread = None  # Keep paging through the workbook instead
+        finally:
+            workbook.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _page(self, number):
+        if number in self.pages:
+            self.pages.move_to_end(number)
+            return self.pages[number]
+        first = 2 + number * SHEET_PAGE_ROWS  # Row 1 is the header
+        rows = list(self.sheet.iter_rows(min_row=first, max_row=first + SHEET_PAGE_ROWS - 1, values_only=True))
+        self.pages[number] = rows
+        while len(self.pages) > self.cached_pages:
+            self.pages.popitem(last=False)
+        return rows
+
+    def view_lines(self, start, count):
+        if self.spooled is not None and self.spooled.complete:
+            lines = self.spooled.view_lines(start, count)
+            self.header = self.spooled.header
+            return lines
+        rows = []
+        number = start // SHEET_PAGE_ROWS
+        offset = start % SHEET_PAGE_ROWS
+        while len(rows) < count and number * SHEET_PAGE_ROWS < self.row_count:
+            rows.extend(islice(self._page(number), offset, offset + count - len(rows)))
+            number += 1
+            offset = 0
+        self.header, lines = format_table(self.header_cells, rows)
+        return lines
+
+    def close(self):
+        self._closed = True
+        if self._thread is not None:
+            self._thread.join()
+        if self.spooled is not None:
+            self.spooled.close()
+        self.workbook.close()
+
+
+class ListDocument:
+    """Lines already in memory: DOCX paragraphs, .xls sheets and UTF-16 text, which cannot be streamed."""
+
+    complete = True
+
+    def __init__(self, lines, header=None):
+        self.lines = lines
+        self.header = header
+        self.row_count = len(lines)
+
+    def view_lines(self, start, count):
+        return self.lines[start:start + count]
+
+    def close(self):
+        pass
+
+
+def open_document(path):
+    """Pick the previewer for a file by extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return CSVDocument(path)
+    if ext in (".xlsx", ".xlsm"):
+        return SheetDocument(path)
+    if ext == ".xls":
+        df = pd.read_excel(path)
+        header, lines = format_table(list(df.columns), df.itertuples(index=False))
+        return ListDocument(lines, header)
+    if ext == ".docx":
+        return ListDocument([para.text for para in Document(path).paragraphs])
+    with open(path, "rb") as file:
+        bom = file.read(2)
+    if bom in (b"\xff\xfe", b"\xfe\xff"):
+        if os.path.getsize(path) > MAX_UTF16_BYTES:
+            return ListDocument(["UTF-16 text this large cannot be previewed."])
+        with open(path, "r", encoding="utf-16") as file:
+            return ListDocument(file.read().splitlines())
+    return TextDocument(path)
+
+
+class VirtualTextView:
+    """Scrollable view that only ever holds the rows on screen, so any file size previews at the same speed."""
+
+    def __init__(self, parent, font=("Courier", 11)):
+        self.frame = tk.Frame(parent, bg="black")
+        self.header_label = tk.Label(self.frame, font=font, anchor="w", justify="left", bg="#222", fg="white")
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text = tk.Text(self.frame, font=font, wrap="none", bg="black", fg="white", insertwidth=0, state="disabled")
+        self.xscrollbar = tk.Scrollbar(self.frame, orient="horizontal", command=self.text.xview)
+        self.xscrollbar.pack(side="bottom", fill="x")
+        self.text.configure(xscrollcommand=self.xscrollbar.set)
+        self.text.pack(side="left", fill="both", expand=True)
+        self.line_height = tkfont.Font(font=font).metrics("linespace")
+        self.document = None
+        self.top = 0
+        self._poll_id = None
+
+        self.text.bind("<Configure>", lambda event: self.render())
+        self.text.bind("<MouseWheel>", lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda event: self.scroll(-3))  # X11 wheel
+        self.text.bind("<Button-5>", lambda event: self.scroll(3))
+        self.text.bind("<Prior>", lambda event: self.scroll(-self.visible_rows))
+        self.text.bind("<Next>", lambda event: self.scroll(self.visible_rows))
+        self.text.bind("<Home>", lambda event: self.scroll(-self.top))
+        self.text.bind("<End>", lambda event: self.scroll(self.document.row_count if self.document else 0))
+
+    @property
+    def visible_rows(self):
+        return max(1, self.text.winfo_height() // self.line_height)
+
+    def show(self, document):
+        """Display a document from its first row, closing the previous one."""
+        self.close()
+        self.document = document
+        self.top = 0
+        self.render()
+        self._poll()
+
+    def close(self):
+        if self._poll_id is not None:
+            self.frame.after_cancel(self._poll_id)
+            self._poll_id = None
+        if self.document is not None:
+            self.document.close()
+            self.document = None
+
+    def scroll(self, rows):
+        if self.document is None:
+            return
+        self.top = max(0, min(self.top + rows, self.document.row_count - self.visible_rows))
+        self.render()
+
+    def render(self):
+        if self.document is None:
+            return
+        lines = self.document.view_lines(self.top, self.visible_rows)
+        if self.document.header is not None:
+            self.header_label.configure(text=self.document.header)
+            self.header_label.pack(side="top", fill="x", before=self.text)
+        else:
+            self.header_label.pack_forget()
+        self.text.configure(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        self.text.configure(state="disabled")
+        total = max(1, self.document.row_count)
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible_rows) / total))
+
+    def _on_scrollbar(self, action, *args):
+        if self.document is None:
+            return
+        if action == "moveto":
+            self.scroll(int(float(args[0]) * self.document.row_count) - self.top)
+        elif action == "scroll":
+            amount = int(args[0])
+            self.scroll(amount * self.visible_rows if args[1] == "pages" else amount)
+
+    def _poll(self):
+        # While the index is still being built, rows keep appearing; refresh the view and scrollbar
+        self._poll_id = None
+        if self.document is not None and not self.document.complete:
+            self.render()
+            self._poll_id = self.frame.after(POLL_MS, self._poll)
+        elif self.document is not None:
+            self.render()
@@ -0,0 +1,151 @@
+import os
+import threading
+import tkinter as tk
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image, ImageTk
+
+from app_cache import cache_dir, file_key
+from lazy_imports import lazy_import
+
+# Loaded on first use so importing this module does not slow down app startup
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# Coarse-to-fine passes: every 16th slot first so something shows up quickly
+THUMBNAIL_STRIDES = (16, 4, 1)
+
+
+def _extract_thumbnails(path, times, size):
+    """Worker process: grab one small RGB frame per timestamp in a time slice."""
+    cap = cv2.VideoCapture(path)
+    thumbs = np.zeros((len(times), size[1], size[0], 3), np.uint8)
+    ok = np.zeros(len(times), bool)
+    for i, seconds in enumerate(times):
+        cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+        ret, frame = cap.read()
+        if ret:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=thumbs[i])
+            ok[i] = True
+    cap.release()
+    return thumbs, ok
+
+
+class ThumbnailStrip:
+    """Evenly spaced thumbnails of a video, generated in a process pool and cached on disk."""
+
+    def __init__(self, path, duration, count=100, size=(160, 90), workers=None):
+        self.path = path
+        self.duration = duration
+        self.count = count
+        self.size = size
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.frames = np.zeros((count, size[1], size[0], 3), np.uint8)
+        self.filled = np.zeros(count, bool)
+        self.cache_path = os.path.join(cache_dir("thumbnails"), f"{file_key(path)}-{count}-{size[0]}x{size[1]}.npz")
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self, on_update=None):
+        """Load whatever is cached and fill in the rest in the background."""
+        self._load()
+        if self.filled.all():
+            return
+        self._thread = threading.Thread(target=self._generate, args=(on_update,), daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def nearest_slot(self, fraction):
+        """Return the closest generated slot to a position on the timeline, or None."""
+        ready = np.flatnonzero(self.filled)
+        if not len(ready):
+            return None
+        wanted = min(self.count - 1, max(0, int(fraction * self.count)))
+        return int(ready[np.abs(ready - wanted).argmin()])
+
+    def _slot_times(self, slots):
+        return [(slot + 0.5) * self.duration / self.count for slot in slots]
+
+    def _generate(self, on_update):
+        pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            for stride in THUMBNAIL_STRIDES:
+                slots = [i for i in range(0, self.count, stride) if not self.filled[i]]
+                if not slots:
+                    continue
+                # One task per worker, each covering a contiguous time slice
+                futures = {}
+                for chunk in np.array_split(np.array(slots), min(self.workers, len(slots))):
+                    future = pool.submit(_extract_thumbnails, self.path, self._slot_times(chunk), self.size)
+                    futures[future] = chunk
+                for future in as_completed(futures):
+                    if self._cancel.is_set():
+                        return
+                    chunk = futures[future]
+                    thumbs, ok = future.result()
+                    self.frames[chunk[ok]] = thumbs[ok]
+                    self.filled[chunk[ok]] = True
+                    if on_update:
+                        on_update(self)
+                self._save()
+        except (OSError, cv2.error) as e:
+            print(f"Thumbnail generation failed for {self.path}: {e}")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _load(self):
+        try:
+            with np.load(self.cache_path) as cached:
+                self.frames[:] = cached["frames"]
+                self.filled[:] = cached["filled"]
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def _save(self):
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, frames=self.frames, filled=self.filled)
+        os.replace(tmp_path, self.cache_path)
+
+
+class ScrubPreview:
+    """Tooltip that shows the thumbnail under the cursor while hovering a progress bar."""
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.strip = None
+        self._window = None
+        self._label = None
+        self._slot = None
+        widget.bind("<Motion>", self._on_motion, add="+")
+        widget.bind("<Leave>", self._on_leave, add="+")
+
+    def _on_motion(self, event):
+        if self.strip is None:
+            return
+        slot = self.strip.nearest_slot(event.x / max(1, self.widget.winfo_width()))
+        if slot is None:
+            return
+
+        if self._window is None:
+            self._window = tk.Toplevel(self.widget)
+            self._window.overrideredirect(True)
+            self._label = tk.Label(self._window, bg="black", bd=1)
+            self._label.pack()
+            self._slot = None
+        if slot != self._slot:
+            imgtk = ImageTk.PhotoImage(image=Image.fromarray(self.strip.frames[slot]))
+            self._label.configure(image=imgtk)
+            self._label.image = imgtk
+            self._slot = slot
+
+        width, height = self.strip.size
+        self._window.geometry(f"+{event.x_root - width // 2}+{event.y_root - height - 20}")
+
+    def _on_leave(self, event):
+        if self._window is not None:
+            self._window.destroy()
+            self._window = None
@@ -0,0 +1,509 @@
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from PIL import Image, ImageTk
+
+from keyframe_index import KeyframeIndex
+from lazy_imports import lazy_import
+
+# Loaded on first use so importing this module does not slow down app startup
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# A decoded frame that is ready to be pushed to Tk; pts is its presentation time in seconds
+VideoFrame = namedtuple("VideoFrame", ["index", "pts", "generation", "image"])
+# Evicted cache images kept for reuse; one eviction per insert once the cache is full
+CACHE_SPARES = 4
+# Seconds of frames cached after each seek; plain playback never reads the cache back, so it skips the copies
+CACHE_SECONDS_AFTER_SEEK = 2
+
+
+class PlaybackClock:
+    """Maps media time onto wall time so frames are shown when they are due."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin_media = 0.0
+        self._origin_wall = None
+        self._paused_at = None
+
+    @property
+    def running(self):
+        return self._origin_wall is not None
+
+    def start(self, media_time, now=None):
+        """Anchor the clock so media_time is shown at `now`."""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self._origin_media = media_time
+            self._origin_wall = now
+            self._paused_at = None
+
+    def reset(self):
+        """Forget the anchor; the next presented frame restarts the clock."""
+        with self._lock:
+            self._origin_wall = None
+            self._paused_at = None
+
+    def media_time(self, now=None):
+        """Return the media time that should be on screen now, or None if not started."""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self._origin_wall is None:
+                return None
+            if self._paused_at is not None:
+                now = self._paused_at
+            return self._origin_media + (now - self._origin_wall)
+
+    def pause(self, now=None):
+        with self._lock:
+            if self._origin_wall is not None and self._paused_at is None:
+                self._paused_at = time.perf_counter() if now is None else now
+
+    def resume(self, now=None):
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self._paused_at is not None:
+                # Shift the anchor by the time spent paused
+                self._origin_wall += now - self._paused_at
+                self._paused_at = None
+
+
+class FrameBuffer:
+    """Bounded ring buffer shared by the decode thread and the Tk main loop."""
+
+    def __init__(self, depth=8):
+        self.depth = max(1, int(depth))
+        self._frames = deque()
+        self._cond = threading.Condition()
+
+    def put(self, frame, stop_event):
+        """Block until there is room for the frame (or the engine is stopping)."""
+        with self._cond:
+            while len(self._frames) >= self.depth and not stop_event.is_set():
+                self._cond.wait(0.1)
+            if stop_event.is_set():
+                return False
+            self._frames.append(frame)
+            return True
+
+    def peek(self):
+        """Return the oldest frame without removing it."""
+        with self._cond:
+            return self._frames[0] if self._frames else None
+
+    def get(self):
+        """Pop the oldest frame, or return None if the buffer is empty."""
+        with self._cond:
+            if not self._frames:
+                return None
+            frame = self._frames.popleft()
+            self._cond.notify()
+            return frame
+
+    def clear(self):
+        with self._cond:
+            self._frames.clear()
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class FrameCache:
+    """Byte-bounded LRU of recently decoded, display-scaled frames keyed by frame index."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._spares = []
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def get(self, index):
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(index)
+            self.hits += 1
+            return frame
+
+    def put(self, frame):
+        """Store a frame whose image the caller no longer writes to."""
+        if frame.image.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._frames.pop(frame.index, None)
+            if old is not None:
+                self._bytes -= old.image.nbytes
+                self._recycle(old.image)
+            self._frames[frame.index] = frame
+            self._bytes += frame.image.nbytes
+            while self._bytes > self.max_bytes:
+                # Least recently used, so not a frame just handed to the UI
+                _, evicted = self._frames.popitem(last=False)
+                self._bytes -= evicted.image.nbytes
+                self._recycle(evicted.image)
+
+    def put_copy(self, frame):
+        """Store a copy of a frame whose image the caller goes on writing to, in a recycled array if one fits."""
+        if frame.image.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            image = None
+            while self._spares and image is None:
+                spare = self._spares.pop()
+                if spare.shape == frame.image.shape and spare.dtype == frame.image.dtype:
+                    image = spare
+        if image is None:
+            image = np.empty_like(frame.image)
+        np.copyto(image, frame.image)
+        self.put(frame._replace(image=image))
+
+    def _recycle(self, image):
+        if len(self._spares) < CACHE_SPARES:
+            self._spares.append(image)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+            self._spares.clear()
+
+
+def fit_size(source_size, box_size):
+    """Scale source_size to fit inside box_size while keeping its aspect ratio."""
+    src_w, src_h = source_size
+    box_w, box_h = box_size
+    if src_w <= 0 or src_h <= 0 or box_w <= 1 or box_h <= 1:
+        return max(1, src_w), max(1, src_h)
+    scale = min(box_w / src_w, box_h / src_h)
+    return max(1, int(src_w * scale)), max(1, int(src_h * scale))
+
+
+class DisplaySink:
+    """Shows RGB frames in a Tk label through one persistent PhotoImage."""
+
+    def __init__(self, label):
+        self.label = label
+        self.source_size = (0, 0)
+        self.box_size = (label.winfo_width(), label.winfo_height())
+        self.target_size = (1, 1)
+        self._photo = None
+        # Only re-measure the label when Tk tells us it changed size
+        label.bind("<Configure>", self._on_configure, add="+")
+
+    def _on_configure(self, event):
+        self.box_size = (event.width, event.height)
+        self.target_size = fit_size(self.source_size, self.box_size)
+
+    def set_source_size(self, width, height):
+        self.source_size = (width, height)
+        self.target_size = fit_size(self.source_size, self.box_size)
+
+    def show(self, frame):
+        """Paste an RGB frame into the PhotoImage, recreating it only when the size changes."""
+        height, width = frame.shape[:2]
+        if self._photo is None or (self._photo.width(), self._photo.height()) != (width, height):
+            self._photo = ImageTk.PhotoImage("RGB", (width, height))
+        if getattr(self.label, "image", None) is not self._photo:
+            # Another preview may have replaced the label image since the last frame
+            self.label.configure(image=self._photo)
+            self.label.image = self._photo
+        # fromarray wraps the buffer without copying; paste writes straight into the Tk image
+        self._photo.paste(Image.fromarray(frame))
+
+
+class VideoEngine:
+    """Decode a video on a worker thread into a FrameBuffer for the Tk loop to drain."""
+
+    def __init__(self, path, buffer_depth=8, cache_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.buffer = FrameBuffer(buffer_depth)
+        self.frame_cache = FrameCache(cache_bytes)
+        self.loop = False
+        self.target_size = None
+        self.dropped_frames = 0
+        self.skipped_frames = 0
+        self.buffer_hits = 0  # Steps served from the decode buffer rather than the cache
+
+        # Read the stream properties up front so the UI has them immediately
+        cap = cv2.VideoCapture(path)
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.cap = cap
+        self.clock = PlaybackClock()
+        self.keyframes = None
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._seek_to = None
+        self._generation = 0
+        self._eof = False
+        self._thread = None
+
+        # Recycled RGB frame buffers, owned by the decode thread
+        self._pool = []
+        self._pool_size = None
+        self._pool_index = 0
+        self._scaled = None
+
+        # Presentation state, only touched from the Tk main loop
+        self.paused = False
+        self.position = 0.0
+        self._shown_index = 0
+        self._pending_frame = None
+        self._show_next = False
+        self._resume_from = None
+        self._presented = deque(maxlen=max(2, int(self.fps * 2)))
+
+    @property
+    def frame_interval(self):
+        return 1.0 / self.fps
+
+    @property
+    def duration(self):
+        return self.total_frames / self.fps
+
+    @property
+    def measured_fps(self):
+        """Frames actually presented per second over the last couple of seconds."""
+        if len(self._presented) < 2:
+            return 0.0
+        elapsed = self._presented[-1] - self._presented[0]
+        return (len(self._presented) - 1) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def poll_interval_ms(self):
+        # Poll at roughly twice the frame rate so frames are never shown late by a whole tick
+        return max(1, int(500 / self.fps))
+
+    @property
+    def finished(self):
+        return self._eof and len(self.buffer) == 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._thread.start()
+        # Seeks fall back to plain CAP_PROP_POS_FRAMES until the index is ready
+        KeyframeIndex.load_in_background(self.path, self._set_keyframes)
+
+    def _set_keyframes(self, index):
+        self.keyframes = index
+
+    def stop(self):
+        self._stop.set()
+        self.buffer.clear()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    def set_target_size(self, width, height):
+        """Set the size the decode thread scales frames to."""
+        self.target_size = (max(1, width), max(1, height))
+
+    def pause(self):
+        self.paused = True
+        self.clock.pause()
+
+    def resume(self):
+        self.paused = False
+        if self._resume_from is not None:
+            # The last steps came from the cache; restart decoding after the frame on screen
+            self.seek(self._resume_from)
+            self._resume_from = None
+        self.clock.resume()
+        self._presented.clear()
+
+    def seek(self, frame_index, use_cache=True):
+        """Ask the decode thread to jump to a frame and drop everything already buffered."""
+        frame_index = max(0, min(int(frame_index), max(self.total_frames - 1, 0)))
+        with self._lock:
+            self._seek_to = frame_index
+            self._generation += 1
+            self._eof = False
+        self.buffer.clear()
+        self.clock.reset()
+        self._presented.clear()
+        self._resume_from = None
+        self._pending_frame = None
+        # While paused, still show where the seek landed
+        self._show_next = self.paused
+
+        # A cached target can go on screen right away; decoding then resumes after it
+        cached = self.frame_cache.get(frame_index) if use_cache else None
+        if cached is not None:
+            self._show_next = False
+            self._pending_frame = cached
+            with self._lock:
+                self._seek_to = min(frame_index + 1, max(self.total_frames - 1, 0))
+
+    def step(self, delta):
+        """Move `delta` frames from the one on screen, serving it from the buffer or cache if possible.
+
+        Returns the frame when it is available immediately; otherwise the decode
+        thread seeks to it and next_frame() hands it over even while paused.
+        """
+        target = max(0, min(self._shown_index + delta, max(self.total_frames - 1, 0)))
+        head = self._peek_current()
+        if head is not None and head.index == target and self._resume_from is None:
+            self.buffer.get()
+            self.buffer_hits += 1
+            return self._present(head)
+
+        cached = self.frame_cache.get(target)
+        if cached is not None:
+            # Leave the decoder where it is until playback resumes
+            self._resume_from = min(target + 1, max(self.total_frames - 1, 0))
+            return self._present(cached)
+
+        self.seek(target, use_cache=False)
+        self._show_next = True
+        return None
+
+    def seek_time(self, seconds):
+        """Seek to a media time in seconds using the container frame rate."""
+        self.seek(round(max(0.0, seconds) * self.fps))
+
+    def next_frame(self, now=None):
+        """Return the frame due for display now, dropping frames that are already late."""
+        now = time.perf_counter() if now is None else now
+        if self._pending_frame is not None:
+            frame, self._pending_frame = self._pending_frame, None
+            return self._present(frame)
+        if self.paused:
+            if self._show_next and self._peek_current() is not None:
+                self._show_next = False
+                return self._present(self.buffer.get())
+            return None
+
+        frame = self._peek_current()
+        if frame is None:
+            return None
+        media_now = self.clock.media_time(now)
+        if media_now is None:
+            # First frame after start or a seek anchors the clock
+            self.clock.start(frame.pts, now)
+        elif frame.pts > media_now:
+            return None
+        frame = self.buffer.get()
+
+        # Drop frames that should already have been shown instead of playing them back late
+        if media_now is not None:
+            newer = self._peek_current()
+            while newer is not None and newer.pts <= media_now:
+                self.buffer.get()
+                frame = newer
+                self.dropped_frames += 1
+                newer = self._peek_current()
+
+        self._presented.append(now)
+        return self._present(frame)
+
+    def _present(self, frame):
+        self.position = frame.index / self.fps
+        self._shown_index = frame.index
+        return frame
+
+    def _peek_current(self):
+        """Peek the oldest frame, discarding frames left over from before a seek."""
+        while True:
+            frame = self.buffer.peek()
+            if frame is None or frame.generation == self._generation:
+                return frame
+            self.buffer.get()
+
+    def _decode_loop(self):
+        cap = self.cap
+        pts_offset = last_pts = 0.0
+        cache_until = -1  # Frames before this index get cached
+        while not self._stop.is_set() and cap.isOpened():
+            with self._lock:
+                seek_to, self._seek_to = self._seek_to, None
+                generation = self._generation
+            if seek_to is not None:
+                self._seek_frame(cap, seek_to)
+                # Stepping and scrubbing come back to the frames around where a seek landed
+                cache_until = seek_to + int(self.fps * CACHE_SECONDS_AFTER_SEEK)
+                pts_offset = 0.0
+                self._eof = False
+
+            if self._eof:
+                time.sleep(0.05)
+                continue
+
+            index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            if not cap.grab():
+                if self.loop:
+                    # Keep timestamps increasing across the wrap so the clock runs straight on
+                    pts_offset = last_pts + self.frame_interval
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                self._eof = True
+                continue
+
+            pts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if pts <= 0 and index > 0:
+                # Some containers report no timestamps; fall back to the nominal frame rate
+                pts = index / self.fps
+            pts += pts_offset
+            last_pts = pts
+
+            # Frames already behind the clock are never shown, so skip converting them
+            media_now = self.clock.media_time()
+            if media_now is not None and pts < media_now - self.frame_interval:
+                self.skipped_frames += 1
+                continue
+
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+            frame = self._to_display(frame)
+            video_frame = VideoFrame(index, pts, generation, frame)
+            if self.frame_cache.max_bytes and (index < cache_until or self.paused):
+                # The pool slot gets recycled, so the cache keeps its own copy
+                self.frame_cache.put_copy(video_frame)
+            self.buffer.put(video_frame, self._stop)
+
+        cap.release()
+
+    def _seek_frame(self, cap, target):
+        """Land exactly on `target`: jump to the keyframe before it, then decode forward."""
+        if self.keyframes is None:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            return
+        key_frame = min(target, round(self.keyframes.keyframe_before(target / self.fps) * self.fps))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, key_frame)
+        for _ in range(target - key_frame):
+            # A newer seek (e.g. while scrubbing) makes finishing this one pointless
+            if self._seek_to is not None or not cap.grab():
+                break
+
+    def _to_display(self, frame):
+        """Scale and colour-convert a BGR frame into the next preallocated RGB slot."""
+        width, height = self.target_size or (frame.shape[1], frame.shape[0])
+        if self._pool_size != (width, height):
+            # Enough slots for a full buffer, one being decoded and one on screen
+            self._pool = [np.empty((height, width, 3), np.uint8) for _ in range(self.buffer.depth + 2)]
+            self._scaled = np.empty((height, width, 3), np.uint8)
+            self._pool_size = (width, height)
+            self._pool_index = 0
+            self.frame_cache.clear()
+
+        slot = self._pool[self._pool_index]
+        self._pool_index = (self._pool_index + 1) % len(self._pool)
+        if (frame.shape[1], frame.shape[0]) != (width, height):
+            cv2.resize(frame, (width, height), dst=self._scaled, interpolation=cv2.INTER_LINEAR)
+            frame = self._scaled
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=slot)
+        return slot